@@ -1,11 +1,14 @@
 import streamlit as st
 import os
 import time
+from contextlib import closing
 from datetime import datetime
 from src.rag_pipeline import RAGPipeline
+from src.entity_index import parse_entity_filters
 from src.ner_processor import NERProcessor
 from src.analytics import DocumentAnalytics
 from src.report_generator import ReportGenerator
+from src.resources import registry
 from config.config import MODELS, DATA_DIR, SUPPORTED_FORMATS
 
 st.set_page_config(
@@ -15,15 +18,16 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+RAGPipeline.warm_up()
+NERProcessor.warm_up()
+
 if 'rag_pipeline' not in st.session_state:
     st.session_state.rag_pipeline = RAGPipeline()
-    st.session_state.ner_processor = NERProcessor()
     st.session_state.analytics = DocumentAnalytics()
     st.session_state.report_gen = ReportGenerator()
     st.session_state.chat_history = []
     st.session_state.uploaded_files = []
     st.session_state.current_model = "fast"
-    st.session_state.processed_docs_data = []
 
 def save_uploaded_file(uploaded_file):
     file_path = os.path.join(DATA_DIR, uploaded_file.name)
@@ -51,6 +55,11 @@ with st.sidebar:
     
     st.info(f"**Use Case:** {MODELS[model_choice]['use_case']}")
     
+    if not RAGPipeline.is_ready():
+        st.warning("⏳ Loading models in the background...")
+        for resource_name, resource_status in registry.status().items():
+            st.caption(f"• {resource_name}: {resource_status}")
+    
     st.markdown("---")
     
     st.header("📄 Document Management")
@@ -71,11 +80,19 @@ with st.sidebar:
                 
                 result = st.session_state.rag_pipeline.ingest_documents(file_paths)
                 st.session_state.uploaded_files.extend(result['documents'])
-                st.session_state.processed_docs_data = result.get('processed_docs', [])
+                st.session_state.uploaded_files.extend(result['skipped_documents'])
                 
-                st.success(f"✅ Processed {result['num_documents']} documents ({result['num_chunks']} chunks)")
+                st.success(f"✅ Processed {result['num_documents']} documents ({result['num_chunks']} chunks, {result['num_embedded']} embedded)")
+                if result['skipped_documents']:
+                    st.info(f"⏭️ Skipped {len(result['skipped_documents'])} unchanged documents")
     
-    if st.session_state.uploaded_files:
+    catalog = st.session_state.rag_pipeline.get_document_catalog() if RAGPipeline.is_ready() else []
+    if catalog:
+        st.markdown("**📁 Indexed Documents:**")
+        for entry in catalog:
+            size_kb = (entry['size_bytes'] or 0) / 1024
+            st.text(f"• {entry['filename']} ({entry['num_chunks']} chunks, {size_kb:.1f} KB)")
+    elif st.session_state.uploaded_files:
         st.markdown("**📁 Uploaded Documents:**")
         for doc in set(st.session_state.uploaded_files):
             st.text(f"• {doc}")
@@ -86,7 +103,6 @@ with st.sidebar:
         st.session_state.rag_pipeline.clear_database()
         st.session_state.chat_history = []
         st.session_state.uploaded_files = []
-        st.session_state.processed_docs_data = []
         st.success("✅ Database cleared!")
         st.rerun()
 
@@ -107,25 +123,49 @@ with tab1:
     with col2:
         use_cache = st.checkbox("Use Cache", value=True, help="Cache queries for faster responses")
     
+    entity_filter_text = st.text_input(
+        "Entity filter (optional)",
+        placeholder="e.g. ORG=Acme, GPE=Paris",
+        help="Only search chunks that mention all of these entities"
+    )
+    
     if st.button("🔍 Get Answer", type="primary") and question:
-        if not st.session_state.uploaded_files:
+        entity_filters = parse_entity_filters(entity_filter_text)
+        unindexed = st.session_state.rag_pipeline.get_unindexed_documents() if entity_filters and catalog else []
+        if not catalog:
             st.warning("⚠️ Please upload and process documents first!")
+        elif unindexed:
+            st.warning(f"⚠️ Entity filters need an entity index. Extract entities first for: {', '.join(unindexed)}")
         else:
-            with st.spinner("Generating answer..."):
-                start_time = time.time()
-                answer, sources, confidence = st.session_state.rag_pipeline.query(question, use_cache=use_cache)
-                response_time = time.time() - start_time
-                
-                st.session_state.analytics.log_query(question, response_time, len(sources))
-                
-                st.session_state.chat_history.append({
-                    "question": question,
-                    "answer": answer,
-                    "sources": sources,
-                    "confidence": confidence,
-                    "response_time": response_time,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
+            start_time = time.time()
+            answer_placeholder = st.empty()
+            answer_placeholder.caption("🔍 Searching documents...")
+            streamed_answer = ""
+            final_event = None
+            
+            events = st.session_state.rag_pipeline.query_stream(question, use_cache=use_cache, entity_filters=entity_filters)
+            with closing(events):
+                for event in events:
+                    if event['type'] == 'token':
+                        streamed_answer += event['content']
+                        answer_placeholder.markdown(f"**Answer:**\n\n{streamed_answer}▌")
+                    else:
+                        final_event = event
+            
+            answer_placeholder.empty()
+            response_time = time.time() - start_time
+            sources = final_event['sources']
+            
+            st.session_state.analytics.log_query(question, response_time, len(sources))
+            
+            st.session_state.chat_history.append({
+                "question": question,
+                "answer": final_event['answer'],
+                "sources": sources,
+                "confidence": final_event['confidence'],
+                "response_time": response_time,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
     
     if st.session_state.chat_history:
         st.markdown("---")
@@ -136,7 +176,7 @@ with tab1:
                 col_a, col_b, col_c = st.columns([2, 1, 1])
                 with col_a:
                     confidence_color = "🟢" if chat['confidence']['level'] == "high" else "🟡" if chat['confidence']['level'] == "medium" else "🔴"
-                    st.caption(f"{confidence_color} Confidence: {chat['confidence']['level'].upper()} ({chat['confidence']['score']:.2f})")
+                    st.caption(f"{confidence_color} Confidence: {chat['confidence']['level'].upper()} ({chat['confidence']['score']:.2f}) - {chat['confidence']['reason']}")
                 with col_b:
                     st.caption(f"⏱️ {chat['response_time']:.2f}s")
                 with col_c:
@@ -146,7 +186,9 @@ with tab1:
                 
                 st.markdown("**📚 Sources:**")
                 for source in chat['sources']:
-                    st.caption(f"[{source['source_number']}] **{source['filename']}** - {source['text']}")
+                    page_label = f" (p. {source['page']})" if source.get('page') else ""
+                    score_label = f" [score {source['score']:.2f}]" if source.get('score') is not None else ""
+                    st.caption(f"[{source['source_number']}] **{source['filename']}**{page_label}{score_label} - {source['text']}")
 
 with tab2:
     st.header("📊 Analytics Dashboard")
@@ -159,7 +201,7 @@ with tab2:
     with col1:
         st.metric("📄 Total Chunks", stats['total_chunks'])
     with col2:
-        st.metric("📁 Documents", len(set(st.session_state.uploaded_files)))
+        st.metric("📁 Documents", len(catalog))
     with col3:
         st.metric("💬 Total Queries", analytics_data['total_queries'])
     with col4:
@@ -174,15 +216,21 @@ with tab2:
     
     with col_left:
         st.subheader("🎯 Performance Metrics")
-        if 'performance' in stats and stats['performance']:
-            perf = stats['performance']
-            for metric_name, metric_data in perf.items():
-                if metric_data['count'] > 0:
-                    st.write(f"**{metric_name.replace('_', ' ').title()}:**")
-                    st.write(f"- Average: {metric_data['avg']:.3f}s")
-                    st.write(f"- Min: {metric_data['min']:.3f}s | Max: {metric_data['max']:.3f}s")
-                    st.write(f"- Count: {metric_data['count']}")
-                    st.markdown("---")
+        perf_rows = [
+            {
+                "Stage": metric_name.replace('_times', '').replace('_', ' ').title(),
+                "Count": metric_data['count'],
+                "p50 (s)": f"{metric_data['p50']:.3f}",
+                "p95 (s)": f"{metric_data['p95']:.3f}",
+                "p99 (s)": f"{metric_data['p99']:.3f}",
+                "Max (s)": f"{metric_data['max']:.3f}"
+            }
+            for metric_name, metric_data in stats.get('performance', {}).items()
+            if metric_data['count'] > 0
+        ]
+        if perf_rows:
+            st.table(perf_rows)
+            st.caption("Percentiles cover the most recent window of each stage")
         else:
             st.info("No performance data yet. Run some queries!")
     
@@ -192,6 +240,8 @@ with tab2:
             cache_stats = stats['cache']
             st.write(f"**Cache Size:** {cache_stats['cache_size']} / {cache_stats['max_size']}")
             st.progress(cache_stats['cache_size'] / cache_stats['max_size'])
+            st.write(f"**Hit Rate:** {cache_stats['hit_rate']:.1%} ({cache_stats['hits']} hits / {cache_stats['misses']} misses)")
+            st.caption(f"Evictions: {cache_stats['evictions']} | Expired or stale: {cache_stats['expirations']}")
         
         st.markdown("---")
         
@@ -203,55 +253,68 @@ with tab2:
 with tab3:
     st.header("🏷️ Named Entity Recognition")
     
-    if st.session_state.processed_docs_data:
+    ner_docs = st.session_state.rag_pipeline.get_all_documents() if RAGPipeline.is_ready() else []
+    
+    if ner_docs:
         selected_doc_for_ner = st.selectbox(
             "Select Document for Entity Extraction",
-            options=[doc['filename'] for doc in st.session_state.processed_docs_data]
+            options=ner_docs
         )
         
         if st.button("🔍 Extract Entities", type="primary"):
             with st.spinner("Extracting entities..."):
-                selected_doc_data = next((doc for doc in st.session_state.processed_docs_data if doc['filename'] == selected_doc_for_ner), None)
+                entities = st.session_state.rag_pipeline.get_entity_summary(selected_doc_for_ner)
                 
-                if selected_doc_data:
-                    entities = st.session_state.ner_processor.get_entity_summary(selected_doc_data['text'])
+                if entities:
+                    st.success(f"✅ Extracted entities from {selected_doc_for_ner}")
                     
-                    if entities:
-                        st.success(f"✅ Extracted entities from {selected_doc_for_ner}")
-                        
-                        for entity_type, data in entities.items():
-                            with st.expander(f"{entity_type} ({data['count']} total, {data['unique']} unique)"):
-                                for entity, count in data['most_common']:
-                                    st.write(f"• **{entity}** - {count} occurrences")
-                    else:
-                        st.info("No entities found in this document")
+                    for entity_type, data in entities.items():
+                        with st.expander(f"{entity_type} ({data['count']} total, {data['unique']} unique)"):
+                            for entity, count in data['most_common']:
+                                st.write(f"• **{entity}** - {count} occurrences")
+                else:
+                    st.info("No entities found in this document")
     else:
         st.info("📤 Upload and process documents to extract entities")
 
 with tab4:
     st.header("🔍 Multi-Document Comparison")
     
-    all_docs = st.session_state.rag_pipeline.get_all_documents()
+    all_docs = st.session_state.rag_pipeline.get_all_documents() if RAGPipeline.is_ready() else []
     
     if len(all_docs) >= 2:
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            doc1 = st.selectbox("Select First Document", options=all_docs, key="doc1")
-        
-        with col2:
-            doc2 = st.selectbox("Select Second Document", options=[d for d in all_docs if d != doc1], key="doc2")
+        selected_docs = st.multiselect("Select Documents to Compare", options=all_docs, default=all_docs[:2])
         
         aspect = st.text_input("Comparison Aspect (optional)", placeholder="e.g., methodology, findings, conclusions")
         
-        if st.button("🔄 Compare Documents", type="primary"):
-            with st.spinner("Comparing documents..."):
-                comparison = st.session_state.rag_pipeline.compare_documents(doc1, doc2, aspect or "general content")
+        if st.button("🔄 Compare Documents", type="primary", disabled=len(selected_docs) < 2):
+            with st.spinner(f"Comparing {len(selected_docs)} documents..."):
+                comparison = st.session_state.rag_pipeline.compare_documents(selected_docs, aspect or "general content")
                 
                 st.markdown("### 📊 Comparison Results")
                 st.markdown(comparison)
     else:
         st.info("📤 Upload at least 2 documents to use comparison feature")
+    
+    if all_docs:
+        st.markdown("---")
+        st.subheader("⚠️ Contradiction Detection")
+        
+        if st.button("🔎 Find Contradictions"):
+            scope = selected_docs if len(all_docs) >= 2 and selected_docs else all_docs
+            with st.spinner(f"Scanning {len(scope)} documents for contradictions..."):
+                contradictions = st.session_state.rag_pipeline.find_contradictions(scope)
+            
+            if contradictions:
+                for i, contradiction in enumerate(contradictions, 1):
+                    with st.expander(f"Contradiction {i}: {contradiction['reason']} (similarity {contradiction['similarity']:.2f})"):
+                        st.write(contradiction['explanation'])
+                        for source in contradiction['sources']:
+                            page_label = f", page {source['page']}" if source.get('page') else ""
+                            st.caption(f"📄 {source['filename']} (chunk {source['chunk_id']}{page_label})")
+                            st.text(source['text'])
+            else:
+                st.success("✅ No contradictions found")
 
 with tab5:
     st.header("📥 Export & Reports")
@@ -300,10 +363,10 @@ with tab5:
                 with st.spinner("Generating analytics report..."):
                     analytics_data = st.session_state.analytics.get_analytics()
                     
-                    entities_data = {}
-                    if st.session_state.processed_docs_data:
-                        all_texts = [doc['text'] for doc in st.session_state.processed_docs_data]
-                        entities_data = st.session_state.ner_processor.extract_from_multiple_docs(all_texts)
+                    entities_data = st.session_state.rag_pipeline.get_corpus_entities(index_missing=False)
+                    unindexed = st.session_state.rag_pipeline.get_unindexed_documents()
+                    if unindexed:
+                        st.info(f"ℹ️ Entity counts exclude documents not yet indexed: {', '.join(unindexed)}")
                     
                     output_path = os.path.join(DATA_DIR, f"analytics_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
                     st.session_state.report_gen.generate_analytics_report(analytics_data, entities_data, output_path)
@@ -0,0 +1,98 @@
+import os
+import random
+from typing import Dict, List
+
+WORDS = (
+    "analysis budget contract customer delivery department estimate forecast growth investment "
+    "liability margin milestone network operations partner policy portfolio procurement project "
+    "quarter regulation report revenue risk schedule security service strategy supplier target "
+    "technology timeline training vendor warehouse workforce audit capacity compliance inventory"
+).split()
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Stark", "Wayne", "Tyrell", "Cyberdyne"]
+CITIES = ["Paris", "Berlin", "Tokyo", "Toronto", "Madrid", "Sydney", "Boston", "Oslo"]
+FORMATS = ["txt", "md", "docx", "pdf"]
+
+def make_paragraph(rng: random.Random, num_sentences: int = 6) -> str:
+    sentences = []
+    for _ in range(num_sentences):
+        words = rng.choices(WORDS, k=rng.randint(8, 16))
+        if rng.random() < 0.4:
+            words.insert(rng.randint(0, len(words)), rng.choice(COMPANIES))
+        if rng.random() < 0.3:
+            words.append(f"in {rng.choice(CITIES)}")
+        if rng.random() < 0.3:
+            words.append(f"worth {rng.randint(1, 900)} million")
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+def make_document(rng: random.Random, num_paragraphs: int) -> List[str]:
+    return [make_paragraph(rng) for _ in range(num_paragraphs)]
+
+def write_txt(path: str, paragraphs: List[str]):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(paragraphs))
+
+def write_md(path: str, paragraphs: List[str]):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, paragraph in enumerate(paragraphs):
+            if i % 5 == 0:
+                f.write(f"## Section {i // 5 + 1}\n\n")
+            f.write(paragraph + "\n\n")
+
+def write_docx(path: str, paragraphs: List[str]):
+    from docx import Document
+    
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+def write_pdf(path: str, paragraphs: List[str]):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph
+    
+    style = getSampleStyleSheet()['Normal']
+    SimpleDocTemplate(path, pagesize=letter).build([Paragraph(paragraph, style) for paragraph in paragraphs])
+
+WRITERS = {
+    "txt": write_txt,
+    "md": write_md,
+    "docx": write_docx,
+    "pdf": write_pdf,
+}
+
+def generate_corpus(output_dir: str, num_documents: int, paragraphs_per_document: int = 40,
+                    formats: List[str] = FORMATS, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i in range(num_documents):
+        file_format = formats[i % len(formats)]
+        path = os.path.join(output_dir, f"doc_{i:05d}.{file_format}")
+        WRITERS[file_format](path, make_document(rng, paragraphs_per_document))
+        paths.append(path)
+    return paths
+
+def generate_questions(num_questions: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    templates = [
+        "What is the {word} of {company}?",
+        "How did {company} handle {word} in {city}?",
+        "Summarize the {word} and {other} plans.",
+        "Which {word} risks are mentioned for {city}?",
+    ]
+    questions = []
+    for _ in range(num_questions):
+        questions.append(rng.choice(templates).format(
+            word=rng.choice(WORDS), other=rng.choice(WORDS),
+            company=rng.choice(COMPANIES), city=rng.choice(CITIES)
+        ))
+    return questions
+
+def corpus_stats(paths: List[str]) -> Dict:
+    return {
+        "num_documents": len(paths),
+        "total_bytes": sum(os.path.getsize(path) for path in paths),
+        "formats": sorted({os.path.splitext(path)[1].lstrip('.') for path in paths})
+    }
@@ -0,0 +1,62 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from src.reranker import Reranker
+from config.config import RERANK_CACHE_SIZE
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+class HashEmbeddingGenerator:
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+    
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def generate_embeddings(self, texts: List[str], show_progress_bar: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.stack([self._embed(text) for text in texts])
+    
+    def generate_single_embedding(self, text: str) -> np.ndarray:
+        return self._embed(text)
+    
+    def get_embedding_dimension(self) -> int:
+        return self.dimension
+    
+    def get_cache_stats(self) -> dict:
+        return {}
+
+class TokenOverlapCrossEncoder:
+    def predict(self, pairs, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        scores = []
+        for query, text in pairs:
+            query_tokens = set(TOKEN_PATTERN.findall(query.lower()))
+            text_tokens = set(TOKEN_PATTERN.findall(text.lower()))
+            scores.append(len(query_tokens & text_tokens) / (len(query_tokens) or 1))
+        return np.asarray(scores, dtype=np.float32)
+
+class OverlapReranker(Reranker):
+    def __init__(self, cache_size: int = RERANK_CACHE_SIZE):
+        self.model_name = "token-overlap"
+        self.model = TokenOverlapCrossEncoder()
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+def install_offline_models():
+    from src.resources import registry
+    
+    registry.get("embedding_generator", HashEmbeddingGenerator)
+    registry.get("reranker", OverlapReranker)
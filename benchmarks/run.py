@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.corpus import FORMATS, generate_corpus, generate_questions, corpus_stats
+from benchmarks.stub_ollama import start_stub_server
+
+def latency_summary(latencies: List[float]) -> Dict:
+    import numpy as np
+    
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(latencies),
+        "mean": float(values.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(values.max())
+    }
+
+def timed_calls(fn, items) -> List[float]:
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def run_worker(args) -> Dict:
+    if args.offline_models:
+        from benchmarks.offline_models import install_offline_models
+        install_offline_models()
+    from src.rag_pipeline import RAGPipeline
+    
+    paths = generate_corpus(
+        os.path.join(args.work_dir, "corpus"), args.size, args.paragraphs, args.formats, args.seed
+    )
+    questions = generate_questions(args.queries, args.seed + 1)
+    pipeline = RAGPipeline()
+    
+    start = time.perf_counter()
+    ingest = pipeline.ingest_documents(paths, extract_entities=args.entities)
+    ingest_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    reingest = pipeline.ingest_documents(paths, extract_entities=args.entities)
+    reingest_seconds = time.perf_counter() - start
+    
+    query_latencies = timed_calls(lambda question: pipeline.query(question, use_cache=False), questions)
+    
+    cached_questions = questions[:args.cache_queries]
+    for question in cached_questions:
+        pipeline.query(question, use_cache=True)
+    cache_latencies = timed_calls(lambda question: pipeline.query(question, use_cache=True), cached_questions)
+    
+    batch_questions = questions[:args.batch_size]
+    start = time.perf_counter()
+    pipeline.query_batch(batch_questions, use_cache=False)
+    batch_seconds = time.perf_counter() - start
+    
+    stats = pipeline.get_stats()
+    return {
+        "size": args.size,
+        "corpus": corpus_stats(paths),
+        "num_chunks": stats['total_chunks'],
+        "ingest": {
+            "seconds": ingest_seconds,
+            "docs_per_second": ingest['num_documents'] / ingest_seconds if ingest_seconds else 0.0,
+            "chunks_per_second": ingest['num_chunks'] / ingest_seconds if ingest_seconds else 0.0,
+            "num_chunks": ingest['num_chunks'],
+            "extract_entities": args.entities
+        },
+        "reingest_unchanged": {
+            "seconds": reingest_seconds,
+            "skipped_documents": len(reingest['skipped_documents'])
+        },
+        "query": latency_summary(query_latencies),
+        "cache_hit": latency_summary(cache_latencies),
+        "query_batch": {
+            "questions": len(batch_questions),
+            "seconds": batch_seconds,
+            "questions_per_second": len(batch_questions) / batch_seconds if batch_seconds else 0.0
+        },
+        "stages": stats['performance'],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+def run_size(args, size: int, ollama_host: str) -> Dict:
+    work_dir = tempfile.mkdtemp(prefix=f"doc-intel-bench-{size}-")
+    result_path = os.path.join(work_dir, "result.json")
+    env = dict(os.environ, DOC_INTEL_DATA_DIR=os.path.join(work_dir, "data"), OLLAMA_HOST=ollama_host)
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--size", str(size), "--work-dir", work_dir, "--result-path", result_path,
+        "--paragraphs", str(args.paragraphs), "--formats", *args.formats, "--seed", str(args.seed),
+        "--queries", str(args.queries), "--cache-queries", str(args.cache_queries),
+        "--batch-size", str(args.batch_size)
+    ]
+    if args.entities:
+        command.append("--entities")
+    if args.offline_models:
+        command.append("--offline-models")
+    
+    try:
+        completed = subprocess.run(command, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"size": size, "error": completed.stderr.strip().splitlines()[-5:]}
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def flatten_metrics(value, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(flatten_metrics(item, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = float(value)
+    return flat
+
+def compare_reports(baseline: Dict, report: Dict) -> Dict[str, Dict]:
+    baseline_runs = {run['size']: run for run in baseline.get('runs', [])}
+    comparison = {}
+    for run in report['runs']:
+        previous = baseline_runs.get(run['size'])
+        if previous is None:
+            continue
+        old_metrics = flatten_metrics(previous)
+        for name, new_value in flatten_metrics(run).items():
+            old_value = old_metrics.get(name)
+            if old_value:
+                comparison[f"{run['size']}:{name}"] = {
+                    "baseline": old_value,
+                    "current": new_value,
+                    "ratio": new_value / old_value
+                }
+    return comparison
+
+def git_revision() -> str:
+    completed = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True)
+    return completed.stdout.strip() if completed.returncode == 0 else ""
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Offline ingest and query benchmarks against a stub Ollama server")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[20, 100], help="Corpus sizes in documents")
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per synthetic document")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--cache-queries", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--entities", action="store_true", help="Run entity extraction during ingest")
+    parser.add_argument("--offline-models", action="store_true",
+                        help="Use hashing embeddings and a token-overlap reranker instead of downloaded models")
+    parser.add_argument("--ollama-host", help="Use this Ollama server instead of the built-in stub")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Stub delay per generated token, in seconds")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary corpora and data directories")
+    parser.add_argument("--output", help="Write the JSON report to this path instead of stdout")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-path", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.worker:
+        result = run_worker(args)
+        with open(args.result_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+    
+    server = None
+    ollama_host = args.ollama_host
+    if not ollama_host:
+        server, ollama_host = start_stub_server(token_latency=args.token_latency)
+    
+    try:
+        runs = [run_size(args, size, ollama_host) for size in args.sizes]
+    finally:
+        if server is not None:
+            server.shutdown()
+    
+    report = {
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "revision": git_revision()
+        },
+        "settings": {key: value for key, value in vars(args).items()
+                     if key not in ("worker", "size", "work_dir", "result_path", "output", "baseline")},
+        "runs": runs
+    }
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report["comparison"] = compare_reports(json.load(f), report)
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+MODULES = [
+    "config.config",
+    "src.document_processor",
+    "src.embeddings",
+    "src.vector_store",
+    "src.llm_handler",
+    "src.performance",
+    "src.advanced_features",
+    "src.rag_pipeline",
+    "src.ner_processor",
+    "src.analytics",
+    "src.report_generator",
+    "streamlit",
+]
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+def measure_import(module: str) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(root=ROOT_DIR, module=module)],
+        capture_output=True, text=True, cwd=ROOT_DIR
+    )
+    if result.returncode != 0:
+        return {"module": module, "error": result.stderr.strip().splitlines()[-1:]}
+    return {"module": module, "import_seconds": float(result.stdout.strip().splitlines()[-1])}
+
+def timed(fn) -> Dict:
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        return {"seconds": time.perf_counter() - start, "error": str(e)}
+    return {"seconds": time.perf_counter() - start}
+
+def measure_first_use(with_llm: bool) -> Dict[str, Dict]:
+    from src.embeddings import EmbeddingGenerator
+    from src.vector_store import VectorStore
+    from src.ner_processor import NERProcessor
+    from src.llm_handler import LLMHandler
+    
+    state = {}
+    results = {
+        "embedding_model_load": timed(lambda: state.setdefault("embedder", EmbeddingGenerator(use_cache=False))),
+    }
+    if "embedder" in state:
+        results["first_embedding"] = timed(lambda: state.setdefault(
+            "embedding", state["embedder"].generate_single_embedding("What is this document about?")
+        ))
+    
+    results["chroma_client_load"] = timed(lambda: state.setdefault("store", VectorStore()))
+    if "store" in state:
+        results["chroma_open_collection"] = timed(state["store"].get_or_create_collection)
+        if "embedding" in state and state["store"].get_collection_count():
+            results["first_search"] = timed(lambda: state["store"].search(
+                state["embedding"].tolist(), query_text="What is this document about?"
+            ))
+    
+    ner = NERProcessor()
+    results["spacy_model_load"] = timed(lambda: ner.nlp)
+    results["first_entity_extraction"] = timed(lambda: ner.extract_entities("Acme Corp paid $5 million to John Smith in Paris on 3 May 2023."))
+    
+    if with_llm:
+        llm = LLMHandler()
+        results["first_llm_response"] = timed(lambda: llm.generate_response("Say hello.", ["hello"]))
+    
+    return results
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure import and first-use cost of the platform's modules")
+    parser.add_argument("--modules", nargs="*", default=MODULES)
+    parser.add_argument("--skip-first-use", action="store_true")
+    parser.add_argument("--with-llm", action="store_true", help="Also time the first Ollama generation")
+    parser.add_argument("--output", help="Write the JSON report to this path instead of stdout")
+    args = parser.parse_args(argv)
+    
+    report = {
+        "python": sys.version.split()[0],
+        "imports": [measure_import(module) for module in args.modules],
+    }
+    if not args.skip_first_use:
+        report["first_use"] = measure_first_use(args.with_llm)
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+def stub_response(model: str, prompt: str, num_tokens: int) -> List[str]:
+    digest = hashlib.sha256(f"{model}\0{prompt}".encode('utf-8')).hexdigest()
+    words = ["Based", "on", "the", "documents", "[Source 1]", "the", "answer", "is"]
+    words.extend(digest[i:i + 6] for i in range(0, 6 * max(0, num_tokens - len(words)), 6))
+    return [f"{word} " for word in words[:num_tokens]]
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": model} for model in ("llama3.2:3b", "mistral:7b")]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+    
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        
+        if self.path == "/api/generate":
+            prompt = request.get("prompt", "")
+        elif self.path == "/api/chat":
+            prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        else:
+            self._send_json({"error": "not found"}, 404)
+            return
+        
+        model = request.get("model", "")
+        tokens = stub_response(model, prompt, self.server.num_tokens)
+        time.sleep(self.server.prompt_latency)
+        
+        if request.get("stream", True):
+            self._stream(model, tokens, chat=self.path == "/api/chat")
+        else:
+            time.sleep(self.server.token_latency * len(tokens))
+            self._send_json(self._message(model, "".join(tokens), True, chat=self.path == "/api/chat"))
+    
+    def _message(self, model: str, text: str, done: bool, chat: bool) -> dict:
+        message = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+        if chat:
+            message["message"] = {"role": "assistant", "content": text}
+        else:
+            message["response"] = text
+        return message
+    
+    def _stream(self, model: str, tokens: List[str], chat: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens + [""]):
+            if token:
+                time.sleep(self.server.token_latency)
+            line = json.dumps(self._message(model, token, i == len(tokens), chat)).encode('utf-8') + b"\n"
+            self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, num_tokens: int = 48,
+                      prompt_latency: float = 0.0, token_latency: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer((host, port), StubOllamaHandler)
+    server.daemon_threads = True
+    server.num_tokens = num_tokens
+    server.prompt_latency = prompt_latency
+    server.token_latency = token_latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic stand-in for the Ollama HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--num-tokens", type=int, default=48)
+    parser.add_argument("--prompt-latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    args = parser.parse_args()
+    
+    server, url = start_stub_server(args.host, args.port, args.num_tokens, args.prompt_latency, args.token_latency)
+    print(f"Stub Ollama listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
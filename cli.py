@@ -0,0 +1,190 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import urllib.request
+from typing import Dict, Iterator, List, Optional
+from config.config import (SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SUPPORTED_FORMATS, CLI_BATCH_SIZE,
+                           INGEST_EXTRACT_ENTITIES, SERVICE_INGEST_ROOT, SERVICE_TOKEN)
+
+def expand_paths(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name) for name in sorted(names)
+                    if os.path.splitext(name)[1].lower() in SUPPORTED_FORMATS
+                )
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(path)
+    return [os.path.abspath(path) for path in files]
+
+def batched(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def read_questions(path: str) -> List[str]:
+    stream = sys.stdin if path == "-" else open(path, 'r', encoding='utf-8')
+    try:
+        return [line.strip() for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def print_json(payload):
+    from src.service import to_json
+    
+    sys.stdout.write(to_json(payload).decode('utf-8') + "\n")
+    sys.stdout.flush()
+
+class RemoteService:
+    def __init__(self, url: str, token: Optional[str] = None):
+        self.url = url.rstrip("/")
+        self.token = token
+    
+    def _open(self, endpoint: str, payload: Dict):
+        request = urllib.request.Request(
+            f"{self.url}{endpoint}",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={"Content-Type": "application/json"}
+        )
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        return urllib.request.urlopen(request)
+    
+    def _post(self, endpoint: str, payload: Dict) -> Dict:
+        with self._open(endpoint, payload) as response:
+            return json.load(response)
+    
+    def ingest(self, file_paths: List[str], extract_entities: bool = INGEST_EXTRACT_ENTITIES) -> Dict:
+        return self._post("/ingest", {"paths": file_paths, "extract_entities": extract_entities})
+    
+    def query(self, question: str, use_cache: bool = True, entity_filters: Optional[str] = None) -> Dict:
+        return self._post("/query", {"question": question, "use_cache": use_cache, "entity_filters": entity_filters})
+    
+    def query_stream(self, question: str, use_cache: bool = True, entity_filters: Optional[str] = None) -> Iterator[Dict]:
+        payload = {"question": question, "use_cache": use_cache, "entity_filters": entity_filters, "stream": True}
+        with self._open("/query", payload) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def query_batch(self, questions: List[str], use_cache: bool = True) -> List[Dict]:
+        return self._post("/query/batch", {"questions": questions, "use_cache": use_cache})["results"]
+
+def open_service(args):
+    if args.url:
+        return RemoteService(args.url, args.token)
+    
+    if args.offline_models:
+        from benchmarks.offline_models import install_offline_models
+        install_offline_models()
+    from src.service import PipelineService
+    
+    service = PipelineService(args.model)
+    service.warm_up()
+    return service
+
+def local_entity_filters(args):
+    if args.url or not args.entity_filters:
+        return args.entity_filters
+    from src.service import request_entity_filters
+    
+    return request_entity_filters(args.entity_filters)
+
+def cmd_serve(args):
+    from src.service import serve
+    
+    serve(args.host, args.port, args.workers, args.model, args.offline_models, args.ingest_root, args.token)
+
+def cmd_ingest(args):
+    service = open_service(args)
+    files = expand_paths(args.paths)
+    totals = {"num_documents": 0, "num_chunks": 0, "skipped_documents": 0}
+    for batch in batched(files, args.batch_size):
+        result = service.ingest(batch, extract_entities=args.entities)
+        totals["num_documents"] += result.get("num_documents", 0)
+        totals["num_chunks"] += result.get("num_chunks", 0)
+        totals["skipped_documents"] += len(result.get("skipped_documents", []))
+        print_json({"files": len(batch), **result})
+    print_json({"total": totals, "files": len(files)})
+
+def cmd_query(args):
+    service = open_service(args)
+    entity_filters = local_entity_filters(args)
+    if not args.stream:
+        print_json(service.query(args.question, not args.no_cache, entity_filters))
+        return
+    
+    for event in service.query_stream(args.question, not args.no_cache, entity_filters):
+        if event["type"] == "token":
+            sys.stdout.write(event["content"])
+            sys.stdout.flush()
+        elif event["type"] == "final":
+            sys.stdout.write("\n")
+            print_json({"sources": event["sources"], "confidence": event["confidence"]})
+        else:
+            print_json(event)
+
+def cmd_batch_query(args):
+    service = open_service(args)
+    questions = read_questions(args.file)
+    for batch in batched(questions, args.batch_size):
+        for result in service.query_batch(batch, not args.no_cache):
+            print_json(result)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Headless Document Intelligence service and batch tools")
+    parser.add_argument("--model", default="llama3.2:3b", help="Ollama model used for generation")
+    parser.add_argument("--offline-models", action="store_true",
+                        help="Use hashing embeddings and a token-overlap reranker instead of downloaded models")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    serve_parser = subparsers.add_parser("serve", help="Run the HTTP JSON service")
+    serve_parser.add_argument("--host", default=SERVICE_HOST)
+    serve_parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    serve_parser.add_argument("--workers", type=int, default=SERVICE_WORKERS,
+                              help="Worker processes sharing the port and the persisted index")
+    serve_parser.add_argument("--ingest-root", default=SERVICE_INGEST_ROOT,
+                              help="Directory that /ingest paths must resolve inside")
+    serve_parser.set_defaults(handler=cmd_serve)
+    
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest files and directories")
+    ingest_parser.add_argument("paths", nargs="+")
+    ingest_parser.add_argument("--batch-size", type=int, default=CLI_BATCH_SIZE, help="Files per ingest call")
+    ingest_parser.add_argument("--entities", action=argparse.BooleanOptionalAction, default=INGEST_EXTRACT_ENTITIES,
+                               help="Run entity extraction during ingest")
+    ingest_parser.set_defaults(handler=cmd_ingest)
+    
+    query_parser = subparsers.add_parser("query", help="Answer one question")
+    query_parser.add_argument("question")
+    query_parser.add_argument("--stream", action="store_true")
+    query_parser.add_argument("--entity-filters", help="Comma-separated TYPE=value filters, e.g. ORG=Acme")
+    query_parser.add_argument("--no-cache", action="store_true")
+    query_parser.set_defaults(handler=cmd_query)
+    
+    batch_parser = subparsers.add_parser("batch-query", help="Answer questions from a file, one per line, as JSON lines")
+    batch_parser.add_argument("--file", default="-", help="Questions file, or - for stdin")
+    batch_parser.add_argument("--batch-size", type=int, default=CLI_BATCH_SIZE)
+    batch_parser.add_argument("--no-cache", action="store_true")
+    batch_parser.set_defaults(handler=cmd_batch_query)
+    
+    for subparser in (ingest_parser, query_parser, batch_parser):
+        subparser.add_argument("--url", help="Send requests to a running service instead of loading the pipeline")
+    for subparser in (serve_parser, ingest_parser, query_parser, batch_parser):
+        subparser.add_argument("--token", default=SERVICE_TOKEN, help="Bearer token for the HTTP service")
+    return parser
+
+def main(argv: List[str] = None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
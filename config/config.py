@@ -1,8 +1,16 @@
 import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.environ.get("DOC_INTEL_DATA_DIR", os.path.join(BASE_DIR, "data"))
 CHROMA_DIR = os.path.join(DATA_DIR, "chroma_db")
+MANIFEST_PATH = os.path.join(DATA_DIR, "manifest.json")
+BM25_INDEX_DIR = os.path.join(DATA_DIR, "bm25_index")
+ENTITY_CACHE_DIR = os.path.join(DATA_DIR, "entity_cache")
+ENTITY_INDEX_DIR = os.path.join(DATA_DIR, "entity_index")
+CHUNK_STORE_DIR = os.path.join(DATA_DIR, "chunk_store")
+SUMMARY_CACHE_DIR = os.path.join(DATA_DIR, "summary_cache")
+INDEX_GENERATION_PATH = os.path.join(DATA_DIR, "index_generation")
+INGEST_LOCK_PATH = os.path.join(DATA_DIR, "ingest.lock")
 
 MODELS = {
     "fast": {
@@ -20,6 +28,8 @@ MODELS = {
 }
 
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = os.path.join(DATA_DIR, "embedding_cache")
+EMBEDDING_CACHE_SIZE = 200000
 
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
@@ -28,5 +38,66 @@ SUPPORTED_FORMATS = [".pdf", ".docx", ".txt", ".md"]
 
 RETRIEVAL_TOP_K = 5
 
+RERANK_ENABLED = True
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 50
+RERANK_BATCH_SIZE = 64
+RERANK_CACHE_SIZE = 20000
+
+SEARCH_MODE = "hybrid"
+HYBRID_CANDIDATES = 50
+RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+QUERY_CACHE_SIMILARITY_THRESHOLD = 0.92
+QUERY_CACHE_TTL = 3600
+
+PERF_WINDOW_SIZE = 1024
+
+LLM_MAX_CONCURRENCY = 4
+OLLAMA_MAX_IN_FLIGHT = 8
+OLLAMA_TIMEOUT = 300
+ASYNC_EXECUTOR_WORKERS = 8
+
+SUMMARY_BATCH_CHARS = 4000
+SUMMARY_FANOUT = 4
+
+COMPARE_TOP_K = 8
+COMPARE_CONTEXT_CHARS = 4000
+
+CONTRADICTION_SIMILARITY = 0.75
+CONTRADICTION_DUPLICATE_SIMILARITY = 0.98
+CONTRADICTION_CANDIDATES = 2000
+CONTRADICTION_BLOCK_SIZE = 1024
+CONTRADICTION_PAIR_BUDGET = 20
+
+CONFIDENCE_MIN_SCORE = 0.2
+CONFIDENCE_FULL_SCORE = 0.6
+CONFIDENCE_SCORE_SPREAD = 0.2
+EARLY_EXIT_ENABLED = True
+EARLY_EXIT_MIN_SCORE = 0.2
+EARLY_EXIT_MIN_RERANK_SCORE = 0.05
+NOT_FOUND_ANSWER = "I cannot find this information in the provided documents."
+
+INGEST_EXTRACT_ENTITIES = False
+NER_BATCH_SIZE = 32
+NER_PROCESSES = 1
+NER_SEGMENT_CHARS = 100000
+
+INGEST_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+EMBEDDING_BATCH_SIZE = 256
+INGEST_QUEUE_SIZE = 4
+PDF_PARALLEL_PAGE_THRESHOLD = 200
+PDF_PAGES_PER_TASK = 25
+
+SERVICE_HOST = os.environ.get("DOC_INTEL_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("DOC_INTEL_PORT", "8000"))
+SERVICE_WORKERS = 1
+SERVICE_MAX_BODY_BYTES = 1 << 20
+SERVICE_INGEST_ROOT = os.environ.get("DOC_INTEL_INGEST_ROOT", os.path.join(DATA_DIR, "inbox"))
+SERVICE_TOKEN = os.environ.get("DOC_INTEL_TOKEN")
+CLI_BATCH_SIZE = 32
+
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(CHROMA_DIR, exist_ok=True)
@@ -1,23 +1,45 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Sequence
+import asyncio
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config.config import (LLM_MAX_CONCURRENCY, CONTRADICTION_SIMILARITY, CONTRADICTION_DUPLICATE_SIMILARITY,
+                           CONTRADICTION_CANDIDATES, CONTRADICTION_BLOCK_SIZE, CONTRADICTION_PAIR_BUDGET,
+                           CONFIDENCE_MIN_SCORE, CONFIDENCE_FULL_SCORE, CONFIDENCE_SCORE_SPREAD)
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*%?")
+NAME_PATTERN = re.compile(r"\b[A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*")
+NAME_STOPWORDS = {"The", "This", "That", "These", "Those", "It", "In", "On", "At", "We", "Our", "An", "And", "But", "For", "If", "As"}
+CITATION_PATTERN = re.compile(r"\[Source (\d+)\]", re.IGNORECASE)
+NEGATION_PATTERN = re.compile(r"\b(?:not|no|never|none|neither|nor|cannot|without)\b|n't\b", re.IGNORECASE)
 
 class DocumentComparison:
-    def __init__(self, llm_handler):
+    def __init__(self, llm_handler, max_workers: int = LLM_MAX_CONCURRENCY):
         self.llm = llm_handler
+        self.max_workers = max_workers
     
-    def compare_documents(self, doc1_chunks: List[str], doc2_chunks: List[str], 
-                         doc1_name: str, doc2_name: str, aspect: str) -> str:
-        
-        doc1_sample = " ".join(doc1_chunks[:3])[:2000]
-        doc2_sample = " ".join(doc2_chunks[:3])[:2000]
+    def _extraction_prompt(self, doc_name: str, chunks: List[str], aspect: str) -> str:
+        excerpts = "\n\n".join(chunks)
         
-        prompt = f"""Compare the following two documents on the aspect: {aspect}
+        return f"""Extract everything the following excerpts from the document "{doc_name}" say about: {aspect}
+
+Excerpts:
+{excerpts}
 
-Document 1 ({doc1_name}):
-{doc1_sample}
+Write a short, factual list of the relevant points. If the excerpts say nothing about it, say so.
+
+Points:"""
+    
+    def _comparison_prompt(self, doc_names: List[str], extractions: List[str], aspect: str) -> str:
+        sections = "\n\n".join(
+            f"Document {i+1} ({doc_name}):\n{extraction}"
+            for i, (doc_name, extraction) in enumerate(zip(doc_names, extractions))
+        )
+        
+        return f"""Compare the following {len(doc_names)} documents on the aspect: {aspect}
 
-Document 2 ({doc2_name}):
-{doc2_sample}
+{sections}
 
 Provide a detailed comparison highlighting:
 1. Similarities
@@ -25,17 +47,119 @@ Provide a detailed comparison highlighting:
 3. Key insights
 
 Comparison:"""
+    
+    def compare_documents(self, documents: Dict[str, List[str]], aspect: str) -> str:
+        doc_names = list(documents)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            extractions = list(executor.map(
+                lambda doc_name: self.llm.generate(self._extraction_prompt(doc_name, documents[doc_name], aspect)),
+                doc_names
+            ))
         
-        import ollama
-        response = ollama.generate(
-            model=self.llm.model_name,
-            prompt=prompt
-        )
+        return self.llm.generate(self._comparison_prompt(doc_names, extractions, aspect))
+    
+    async def acompare_documents(self, documents: Dict[str, List[str]], aspect: str) -> str:
+        doc_names = list(documents)
+        extractions = await asyncio.gather(*[
+            self.llm.agenerate(self._extraction_prompt(doc_name, documents[doc_name], aspect))
+            for doc_name in doc_names
+        ])
+        
+        return await self.llm.agenerate(self._comparison_prompt(doc_names, extractions, aspect))
+    
+    def candidate_pairs(self, embeddings: np.ndarray, metadatas: List[Dict],
+                        threshold: float = CONTRADICTION_SIMILARITY, max_candidates: int = CONTRADICTION_CANDIDATES,
+                        block_size: int = CONTRADICTION_BLOCK_SIZE) -> List[Tuple[float, int, int]]:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        filenames = np.array([meta['filename'] for meta in metadatas], dtype=object)
+        ordinals = np.array([meta.get('chunk_id', 0) for meta in metadatas], dtype=np.int64)
+        
+        kept_scores = np.zeros(0, dtype=np.float32)
+        kept_pairs = np.zeros((0, 2), dtype=np.int64)
+        for row_start in range(0, len(matrix), block_size):
+            block = matrix[row_start:row_start + block_size]
+            for col_start in range(row_start, len(matrix), block_size):
+                scores = block @ matrix[col_start:col_start + block_size].T
+                rows, cols = np.nonzero(scores >= threshold)
+                left, right = rows + row_start, cols + col_start
+                scores = scores[rows, cols]
+                adjacent = (filenames[left] == filenames[right]) & (np.abs(ordinals[left] - ordinals[right]) <= 1)
+                keep = (right > left) & ~adjacent & (scores < CONTRADICTION_DUPLICATE_SIMILARITY)
+                if not keep.any():
+                    continue
+                
+                kept_scores = np.concatenate([kept_scores, scores[keep]])
+                kept_pairs = np.concatenate([kept_pairs, np.stack([left[keep], right[keep]], axis=1)])
+                if len(kept_scores) > max_candidates:
+                    top = np.argpartition(-kept_scores, max_candidates - 1)[:max_candidates]
+                    kept_scores, kept_pairs = kept_scores[top], kept_pairs[top]
+        
+        order = np.argsort(-kept_scores, kind='stable')
+        return [(float(kept_scores[i]), int(kept_pairs[i, 0]), int(kept_pairs[i, 1])) for i in order]
+    
+    def _mismatch_reason(self, text1: str, text2: str) -> str:
+        numbers1 = set(NUMBER_PATTERN.findall(text1))
+        numbers2 = set(NUMBER_PATTERN.findall(text2))
+        names1 = set(NAME_PATTERN.findall(text1)) - NAME_STOPWORDS
+        names2 = set(NAME_PATTERN.findall(text2)) - NAME_STOPWORDS
+        negated1 = bool(NEGATION_PATTERN.search(text1))
+        negated2 = bool(NEGATION_PATTERN.search(text2))
+        
+        if numbers1 and numbers2 and numbers1 != numbers2 and (names1 & names2 or not names1 or not names2):
+            return "Different figures for the same subject"
+        if names1 & names2 and negated1 != negated2:
+            return "Negated statement about the same subject"
+        return ""
+    
+    def _verify(self, text1: str, text2: str) -> Tuple[bool, str]:
+        prompt = f"""Do the following two passages contradict each other? A contradiction means they make incompatible claims about the same thing.
+
+Passage A:
+{text1[:1500]}
+
+Passage B:
+{text2[:1500]}
+
+Answer YES or NO on the first line, then explain in one sentence.
+
+Answer:"""
         
-        return response['response']
+        response = self.llm.generate(prompt).strip()
+        return response.upper().startswith("YES"), response
     
-    def find_contradictions(self, chunks: List[str], metadatas: List[Dict]) -> List[Dict]:
+    def find_contradictions(self, chunks: Sequence[str], metadatas: List[Dict], embeddings: np.ndarray,
+                            max_pairs: int = CONTRADICTION_PAIR_BUDGET) -> List[Dict]:
+        suspects = []
+        for similarity, i, j in self.candidate_pairs(embeddings, metadatas):
+            reason = self._mismatch_reason(chunks[i], chunks[j])
+            if reason:
+                suspects.append((similarity, i, j, reason))
+                if len(suspects) >= max_pairs:
+                    break
+        
+        texts = {i: chunks[i] for _, a, b, _ in suspects for i in (a, b)}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            verdicts = list(executor.map(lambda suspect: self._verify(texts[suspect[1]], texts[suspect[2]]), suspects))
+        
         contradictions = []
+        for (similarity, i, j, reason), (confirmed, explanation) in zip(suspects, verdicts):
+            if not confirmed:
+                continue
+            contradictions.append({
+                "similarity": similarity,
+                "reason": reason,
+                "explanation": explanation,
+                "sources": [
+                    {
+                        "filename": metadatas[k]['filename'],
+                        "chunk_id": metadatas[k].get('chunk_id'),
+                        "page": metadatas[k].get('page'),
+                        "text": texts[k][:200] + "..." if len(texts[k]) > 200 else texts[k]
+                    }
+                    for k in (i, j)
+                ]
+            })
         
         return contradictions
     
@@ -50,12 +174,60 @@ class ConfidenceScorer:
         self.threshold_high = 0.8
         self.threshold_medium = 0.5
     
+    def _level(self, confidence: float) -> str:
+        if confidence >= self.threshold_high:
+            return "high"
+        if confidence >= self.threshold_medium:
+            return "medium"
+        return "low"
+    
     def calculate_confidence(self, sources: List[Dict], answer: str) -> Dict:
         if not sources:
             return {"score": 0.0, "level": "low", "reason": "No sources found"}
         
         num_sources = len(sources)
         
+        if any(source.get('score') is None for source in sources):
+            return self._calculate_legacy_confidence(sources, answer)
+        
+        scores = np.array([source['score'] for source in sources], dtype=np.float32)
+        best_score = float(scores.max())
+        relevance = float(np.clip((best_score - CONFIDENCE_MIN_SCORE) / (CONFIDENCE_FULL_SCORE - CONFIDENCE_MIN_SCORE), 0.0, 1.0))
+        margin = float(np.clip((best_score - np.median(scores)) / CONFIDENCE_SCORE_SPREAD, 0.0, 1.0))
+        consistency = float(1.0 - np.clip(scores.std() / CONFIDENCE_SCORE_SPREAD, 0.0, 1.0))
+        
+        cited = np.zeros(num_sources, dtype=bool)
+        for number in CITATION_PATTERN.findall(answer):
+            if 1 <= int(number) <= num_sources:
+                cited[int(number) - 1] = True
+        coverage = float(cited.mean())
+        
+        confidence = 0.5 * relevance + 0.15 * margin + 0.1 * consistency + 0.25 * coverage
+        
+        if "cannot find" in answer.lower() or "not in the" in answer.lower():
+            confidence = min(confidence, 0.3)
+            reason = "AI indicated information not found"
+        elif relevance < 0.3:
+            reason = f"Weak retrieval match (best score {best_score:.2f})"
+        elif not cited.any():
+            reason = f"Relevant sources (best score {best_score:.2f}) but the answer cites none"
+        else:
+            reason = f"Best score {best_score:.2f}, {int(cited.sum())} of {num_sources} sources cited"
+        
+        return {
+            "score": round(confidence, 3),
+            "level": self._level(confidence),
+            "reason": reason,
+            "num_sources": num_sources,
+            "best_score": best_score,
+            "score_margin": margin,
+            "score_dispersion": float(scores.std()),
+            "citation_coverage": coverage
+        }
+    
+    def _calculate_legacy_confidence(self, sources: List[Dict], answer: str) -> Dict:
+        num_sources = len(sources)
+        
         answer_length = len(answer.split())
         
         if "cannot find" in answer.lower() or "not in the" in answer.lower():
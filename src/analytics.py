@@ -1,5 +1,3 @@
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
 import numpy as np
 from typing import List, Dict
 
@@ -9,6 +7,9 @@ class DocumentAnalytics:
         self.response_times = []
     
     def cluster_documents(self, embeddings: np.ndarray, n_clusters: int = 5) -> Dict:
+        from sklearn.cluster import KMeans
+        from sklearn.decomposition import PCA
+        
         if len(embeddings) < n_clusters:
             n_clusters = max(2, len(embeddings) // 2)
         
@@ -0,0 +1,288 @@
+import json
+import mmap
+import os
+import threading
+from array import array
+from collections import Counter
+from typing import List, Dict, Optional, Iterator, Sequence, Union
+import numpy as np
+from config.config import CHUNK_STORE_DIR
+
+class ChunkTextView(Sequence):
+    def __init__(self, store: "ChunkStore", chunk_ids: List[str]):
+        self.store = store
+        self.chunk_ids = chunk_ids
+    
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+    
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, "ChunkTextView"]:
+        if isinstance(index, slice):
+            return ChunkTextView(self.store, self.chunk_ids[index])
+        return self.store.get_text(self.chunk_ids[index])
+    
+    def __iter__(self) -> Iterator[str]:
+        for chunk_id in self.chunk_ids:
+            yield self.store.get_text(chunk_id)
+    
+    def byte_slices(self) -> Iterator[memoryview]:
+        for chunk_id in self.chunk_ids:
+            yield self.store.get_bytes(chunk_id)
+
+class ChunkStore:
+    def __init__(self, store_dir: str = CHUNK_STORE_DIR):
+        self.store_dir = store_dir
+        self.blob_path = os.path.join(store_dir, "text.bin")
+        self.lock = threading.RLock()
+        self._writer = None
+        self._map = None
+        self._mapped_size = 0
+        self._reset()
+    
+    def _reset(self):
+        self.offsets = array('q')
+        self.lengths = array('i')
+        self.chunk_docs = array('i')
+        self.chunk_pages = array('i')
+        self.chunk_ordinals = array('i')
+        self.live = bytearray()
+        self.chunk_ids = []
+        self.chunk_index = {}
+        self.documents = []
+        self.document_index = {}
+        self.document_chunks = Counter()
+        self.blob_size = 0
+        self.dead_bytes = 0
+    
+    @property
+    def num_chunks(self) -> int:
+        return len(self.chunk_index)
+    
+    def has_document(self, filename: str) -> bool:
+        return self.document_chunks.get(filename, 0) > 0
+    
+    def list_documents(self) -> List[str]:
+        with self.lock:
+            return [filename for filename in self.documents if self.document_chunks.get(filename, 0) > 0]
+    
+    def _open_writer(self):
+        if self._writer is None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            self._writer = open(self.blob_path, 'ab')
+            if self._writer.tell() > self.blob_size:
+                self._writer.truncate(self.blob_size)
+        return self._writer
+    
+    def _close_files(self):
+        self._map = None
+        self._mapped_size = 0
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+    
+    def add(self, chunk_ids: List[str], chunks: List[str], metadatas: List[Dict]):
+        with self.lock:
+            writer = self._open_writer()
+            for chunk_id, chunk, meta in zip(chunk_ids, chunks, metadatas):
+                if chunk_id in self.chunk_index:
+                    self._set_position(self.chunk_index[chunk_id], meta)
+                    continue
+                
+                filename = meta['filename']
+                doc_position = self.document_index.get(filename)
+                if doc_position is None:
+                    doc_position = len(self.documents)
+                    self.document_index[filename] = doc_position
+                    self.documents.append(filename)
+                
+                data = chunk.encode('utf-8')
+                writer.write(data)
+                position = len(self.chunk_ids)
+                self.chunk_ids.append(chunk_id)
+                self.chunk_index[chunk_id] = position
+                self.offsets.append(self.blob_size)
+                self.lengths.append(len(data))
+                self.chunk_docs.append(doc_position)
+                self.chunk_pages.append(meta.get('page', -1))
+                self.chunk_ordinals.append(meta.get('chunk_id', 0))
+                self.live.append(1)
+                self.document_chunks[filename] += 1
+                self.blob_size += len(data)
+            writer.flush()
+    
+    def _set_position(self, position: int, meta: Dict):
+        self.chunk_pages[position] = meta.get('page', -1)
+        self.chunk_ordinals[position] = meta.get('chunk_id', 0)
+    
+    def update_metadatas(self, chunk_ids: List[str], metadatas: List[Dict]):
+        with self.lock:
+            for chunk_id, meta in zip(chunk_ids, metadatas):
+                position = self.chunk_index.get(chunk_id)
+                if position is not None:
+                    self._set_position(position, meta)
+    
+    def remove(self, chunk_ids: List[str]):
+        with self.lock:
+            for chunk_id in chunk_ids:
+                position = self.chunk_index.pop(chunk_id, None)
+                if position is not None:
+                    self.live[position] = 0
+                    self.dead_bytes += self.lengths[position]
+                    self.document_chunks[self.documents[self.chunk_docs[position]]] -= 1
+    
+    def clear(self):
+        with self.lock:
+            self._close_files()
+            if os.path.exists(self.blob_path):
+                os.remove(self.blob_path)
+            self._reset()
+    
+    def get_bytes(self, chunk_id: str) -> Optional[memoryview]:
+        with self.lock:
+            position = self.chunk_index.get(chunk_id)
+            if position is None:
+                return None
+            start = self.offsets[position]
+            end = start + self.lengths[position]
+            if start == end:
+                return memoryview(b'')
+            if end > self._mapped_size:
+                self._remap()
+            return memoryview(self._map)[start:end]
+    
+    def get_text(self, chunk_id: str) -> Optional[str]:
+        data = self.get_bytes(chunk_id)
+        return None if data is None else str(data, 'utf-8')
+    
+    def _remap(self):
+        if self._writer is not None:
+            self._writer.flush()
+        with open(self.blob_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped_size = len(self._map)
+    
+    def document_chunk_ids(self, filename: str) -> List[str]:
+        with self.lock:
+            doc_position = self.document_index.get(filename)
+            if doc_position is None:
+                return []
+            live = np.frombuffer(self.live, dtype=np.uint8).astype(bool)
+            positions = np.flatnonzero(live & (np.frombuffer(self.chunk_docs, dtype=np.int32) == doc_position))
+            ordinals = np.frombuffer(self.chunk_ordinals, dtype=np.int32)[positions]
+            positions = positions[np.argsort(ordinals, kind='stable')]
+            return [self.chunk_ids[position] for position in positions]
+    
+    def document_bytes(self, filename: str) -> int:
+        with self.lock:
+            return sum(self.lengths[self.chunk_index[chunk_id]] for chunk_id in self.document_chunk_ids(filename))
+    
+    def document_texts(self, filename: str) -> ChunkTextView:
+        return ChunkTextView(self, self.document_chunk_ids(filename))
+    
+    def get_page(self, chunk_id: str) -> Optional[int]:
+        with self.lock:
+            position = self.chunk_index.get(chunk_id)
+            if position is None or self.chunk_pages[position] < 0:
+                return None
+            return self.chunk_pages[position]
+    
+    def _compact(self):
+        positions = [position for position in range(len(self.chunk_ids)) if self.live[position]]
+        tmp_path = f"{self.blob_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for position in positions:
+                start = self.offsets[position]
+                f.write(self._map[start:start + self.lengths[position]])
+        
+        documents = [self.documents[self.chunk_docs[position]] for position in positions]
+        chunk_ids = [self.chunk_ids[position] for position in positions]
+        lengths = [self.lengths[position] for position in positions]
+        pages = [self.chunk_pages[position] for position in positions]
+        ordinals = [self.chunk_ordinals[position] for position in positions]
+        
+        self._close_files()
+        os.replace(tmp_path, self.blob_path)
+        self._reset()
+        for chunk_id, filename, length, page, ordinal in zip(chunk_ids, documents, lengths, pages, ordinals):
+            doc_position = self.document_index.get(filename)
+            if doc_position is None:
+                doc_position = len(self.documents)
+                self.document_index[filename] = doc_position
+                self.documents.append(filename)
+            self.chunk_index[chunk_id] = len(self.chunk_ids)
+            self.chunk_ids.append(chunk_id)
+            self.offsets.append(self.blob_size)
+            self.lengths.append(length)
+            self.chunk_docs.append(doc_position)
+            self.chunk_pages.append(page)
+            self.chunk_ordinals.append(ordinal)
+            self.live.append(1)
+            self.document_chunks[filename] += 1
+            self.blob_size += length
+    
+    def save(self):
+        with self.lock:
+            if self.dead_bytes > self.blob_size - self.dead_bytes:
+                self._remap()
+                self._compact()
+            
+            os.makedirs(self.store_dir, exist_ok=True)
+            if self._writer is not None:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+            
+            arrays_path = os.path.join(self.store_dir, "columns.npz")
+            np.savez(
+                f"{arrays_path}.tmp.npz",
+                offsets=np.frombuffer(self.offsets.tobytes(), dtype=np.int64),
+                lengths=np.frombuffer(self.lengths.tobytes(), dtype=np.int32),
+                chunk_docs=np.frombuffer(self.chunk_docs.tobytes(), dtype=np.int32),
+                pages=np.frombuffer(self.chunk_pages.tobytes(), dtype=np.int32),
+                ordinals=np.frombuffer(self.chunk_ordinals.tobytes(), dtype=np.int32),
+                live=np.frombuffer(bytes(self.live), dtype=np.uint8)
+            )
+            
+            meta_path = os.path.join(self.store_dir, "meta.json")
+            with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump({"chunk_ids": self.chunk_ids, "documents": self.documents, "blob_size": self.blob_size}, f)
+            
+            os.replace(f"{arrays_path}.tmp.npz", arrays_path)
+            os.replace(f"{meta_path}.tmp", meta_path)
+    
+    def load(self) -> bool:
+        arrays_path = os.path.join(self.store_dir, "columns.npz")
+        meta_path = os.path.join(self.store_dir, "meta.json")
+        with self.lock:
+            self._close_files()
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                data = np.load(arrays_path)
+                offsets, lengths, chunk_docs = data['offsets'], data['lengths'], data['chunk_docs']
+                pages, ordinals, live = data['pages'], data['ordinals'], data['live']
+                blob_size = os.path.getsize(self.blob_path)
+            except (FileNotFoundError, KeyError, ValueError, OSError):
+                self._reset()
+                return False
+            
+            self._reset()
+            if blob_size < meta['blob_size']:
+                return False
+            
+            self.offsets = array('q', offsets.astype(np.int64).tobytes())
+            self.lengths = array('i', lengths.astype(np.int32).tobytes())
+            self.chunk_docs = array('i', chunk_docs.astype(np.int32).tobytes())
+            self.chunk_pages = array('i', pages.astype(np.int32).tobytes())
+            self.chunk_ordinals = array('i', ordinals.astype(np.int32).tobytes())
+            self.live = bytearray(live.astype(np.uint8).tobytes())
+            self.chunk_ids = meta['chunk_ids']
+            self.documents = meta['documents']
+            self.document_index = {filename: position for position, filename in enumerate(self.documents)}
+            self.blob_size = meta['blob_size']
+            for position, chunk_id in enumerate(self.chunk_ids):
+                if self.live[position]:
+                    self.chunk_index[chunk_id] = position
+                    self.document_chunks[self.documents[self.chunk_docs[position]]] += 1
+                else:
+                    self.dead_bytes += self.lengths[position]
+            return True
@@ -1,55 +1,171 @@
 import os
-from typing import List, Dict
-from PyPDF2 import PdfReader
-from docx import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from config.config import CHUNK_SIZE, CHUNK_OVERLAP
+import hashlib
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Dict, Iterator, Iterable, Optional, Tuple
+from config.config import (
+    CHUNK_SIZE, CHUNK_OVERLAP, INGEST_WORKERS, PDF_PARALLEL_PAGE_THRESHOLD, PDF_PAGES_PER_TASK
+)
+
+_worker_processor = None
+
+def _get_worker_processor() -> "DocumentProcessor":
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor()
+    return _worker_processor
+
+def _process_document_worker(file_path: str) -> Dict:
+    return _get_worker_processor().process_document(file_path)
+
+def _extract_pdf_pages_worker(file_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    return list(_get_worker_processor().iter_pdf_pages(file_path, start, stop))
 
 class DocumentProcessor:
+    SPLIT_BUFFER_CHARS = CHUNK_SIZE * 8
+    
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-        )
+        self._text_splitter = None
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP,
+                length_function=len,
+            )
+        return self._text_splitter
+    
+    def compute_file_hash(self, file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def get_pdf_page_count(self, file_path: str) -> int:
+        from PyPDF2 import PdfReader
+        
+        return len(PdfReader(file_path).pages)
+    
+    def iter_pdf_pages(self, file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        from PyPDF2 import PdfReader
+        
         reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for page_number in range(start, stop):
+            yield page_number + 1, reader.pages[page_number].extract_text() or ""
     
-    def extract_text_from_docx(self, file_path: str) -> str:
+    def iter_pdf_pages_parallel(self, file_path: str, executor: Executor, max_pending: int) -> Iterator[Tuple[int, str]]:
+        page_count = self.get_pdf_page_count(file_path)
+        ranges = iter(range(0, page_count, PDF_PAGES_PER_TASK))
+        pending = deque()
+        for start in ranges:
+            pending.append(executor.submit(_extract_pdf_pages_worker, file_path, start, start + PDF_PAGES_PER_TASK))
+            if len(pending) >= max_pending:
+                break
+        
+        while pending:
+            pages = pending.popleft().result()
+            next_start = next(ranges, None)
+            if next_start is not None:
+                pending.append(executor.submit(_extract_pdf_pages_worker, file_path, next_start, next_start + PDF_PAGES_PER_TASK))
+            yield from pages
+    
+    def iter_docx_paragraphs(self, file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+        from docx import Document
+        
         doc = Document(file_path)
-        text = ""
         for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+            yield None, paragraph.text
     
-    def extract_text_from_txt(self, file_path: str) -> str:
+    def iter_txt_lines(self, file_path: str) -> Iterator[Tuple[Optional[int], str]]:
         with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+            for line in f:
+                yield None, line.rstrip("\n")
     
-    def process_document(self, file_path: str) -> Dict:
+    def iter_segments(self, file_path: str) -> Iterator[Tuple[Optional[int], str]]:
         ext = os.path.splitext(file_path)[1].lower()
-        filename = os.path.basename(file_path)
         
         if ext == '.pdf':
-            text = self.extract_text_from_pdf(file_path)
+            return self.iter_pdf_pages(file_path)
         elif ext == '.docx':
-            text = self.extract_text_from_docx(file_path)
+            return self.iter_docx_paragraphs(file_path)
         elif ext in ['.txt', '.md']:
-            text = self.extract_text_from_txt(file_path)
+            return self.iter_txt_lines(file_path)
         else:
             raise ValueError(f"Unsupported file format: {ext}")
+    
+    def _locate_chunks(self, buffer: str, chunks: List[str]) -> List[int]:
+        starts = []
+        search_from = 0
+        for chunk in chunks:
+            found = buffer.find(chunk, search_from)
+            start = found if found >= 0 else search_from
+            starts.append(start)
+            search_from = max(start + len(chunk) - CHUNK_OVERLAP, start + 1)
+        return starts
+    
+    def iter_chunks(self, segments: Iterable[Tuple[Optional[int], str]]) -> Iterator[Tuple[str, Optional[int]]]:
+        parts = []
+        part_offsets = []
+        part_pages = []
+        buffered = 0
         
-        chunks = self.text_splitter.split_text(text)
+        for page, text in segments:
+            part_offsets.append(buffered)
+            part_pages.append(page)
+            parts.append(text + "\n")
+            buffered += len(text) + 1
+            
+            if buffered < self.SPLIT_BUFFER_CHARS:
+                continue
+            
+            buffer = "".join(parts)
+            chunks = self.text_splitter.split_text(buffer)
+            starts = self._locate_chunks(buffer, chunks)
+            for chunk, start in zip(chunks[:-1], starts[:-1]):
+                yield chunk, part_pages[bisect_right(part_offsets, start) - 1]
+            
+            carry_start = starts[-1] if chunks else len(buffer)
+            carry_index = bisect_right(part_offsets, carry_start) - 1
+            parts = [buffer[carry_start:]]
+            part_offsets = [0] + [offset - carry_start for offset in part_offsets[carry_index + 1:]]
+            part_pages = part_pages[carry_index:]
+            buffered = len(parts[0])
+        
+        buffer = "".join(parts)
+        chunks = self.text_splitter.split_text(buffer)
+        for chunk, start in zip(chunks, self._locate_chunks(buffer, chunks)):
+            yield chunk, part_pages[bisect_right(part_offsets, start) - 1]
+    
+    def extract_text_from_pdf(self, file_path: str) -> str:
+        return "".join(f"{text}\n" for _, text in self.iter_pdf_pages(file_path))
+    
+    def extract_text_from_docx(self, file_path: str) -> str:
+        return "".join(f"{text}\n" for _, text in self.iter_docx_paragraphs(file_path))
+    
+    def extract_text_from_txt(self, file_path: str) -> str:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def process_document(self, file_path: str) -> Dict:
+        filename = os.path.basename(file_path)
+        
+        chunks = []
+        pages = []
+        for chunk, page in self.iter_chunks(self.iter_segments(file_path)):
+            chunks.append(chunk)
+            pages.append(page)
         
         return {
             "filename": filename,
-            "text": text,
             "chunks": chunks,
+            "pages": pages,
             "num_chunks": len(chunks)
         }
     
@@ -57,8 +173,77 @@ class DocumentProcessor:
         results = []
         for file_path in file_paths:
             try:
-                result = self.process_document(file_path)
-                results.append(result)
+                results.append(self.process_document(file_path))
             except Exception as e:
                 print(f"Error processing {file_path}: {str(e)}")
         return results
+    
+    def _is_large_pdf(self, file_path: str) -> bool:
+        if os.path.splitext(file_path)[1].lower() != '.pdf':
+            return False
+        try:
+            return self.get_pdf_page_count(file_path) > PDF_PARALLEL_PAGE_THRESHOLD
+        except Exception:
+            return False
+    
+    def _stream_document(self, file_path: str, segments: Iterable[Tuple[Optional[int], str]]) -> Dict:
+        return {
+            "filename": os.path.basename(file_path),
+            "chunks": self.iter_chunks(segments),
+            "num_chunks": None
+        }
+    
+    def _as_stream(self, result: Dict) -> Dict:
+        return {
+            "filename": result["filename"],
+            "chunks": zip(result["chunks"], result["pages"]),
+            "num_chunks": result["num_chunks"]
+        }
+    
+    def iter_process_documents(self, file_paths: List[str], max_workers: int = INGEST_WORKERS) -> Iterator[Dict]:
+        large_pdfs = {}
+        
+        def is_large_pdf(file_path: str) -> bool:
+            if file_path not in large_pdfs:
+                large_pdfs[file_path] = self._is_large_pdf(file_path)
+            return large_pdfs[file_path]
+        
+        if max_workers <= 1 or (len(file_paths) <= 1 and not any(map(is_large_pdf, file_paths))):
+            for file_path in file_paths:
+                try:
+                    if is_large_pdf(file_path):
+                        yield self._stream_document(file_path, self.iter_pdf_pages(file_path))
+                    else:
+                        yield self._as_stream(self.process_document(file_path))
+                except Exception as e:
+                    print(f"Error processing {file_path}: {str(e)}")
+            return
+        
+        paths = iter(file_paths)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            def submit(file_path: str):
+                if is_large_pdf(file_path):
+                    return file_path, None
+                return file_path, executor.submit(_process_document_worker, file_path)
+            
+            pending = deque()
+            for file_path in paths:
+                pending.append(submit(file_path))
+                if len(pending) >= max_workers * 2:
+                    break
+            
+            while pending:
+                file_path, future = pending.popleft()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append(submit(next_path))
+                
+                try:
+                    if future is None:
+                        yield self._stream_document(
+                            file_path, self.iter_pdf_pages_parallel(file_path, executor, max_workers * 2)
+                        )
+                    else:
+                        yield self._as_stream(future.result())
+                except Exception as e:
+                    print(f"Error processing {file_path}: {str(e)}")
@@ -0,0 +1,256 @@
+import atexit
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+import numpy as np
+from config.config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 40
+JOURNAL_DTYPE = np.dtype([('key', f'S{KEY_BYTES}'), ('row', '<i4')])
+
+class EmbeddingCache:
+    FLUSH_EVERY = 256
+    FLUSH_INTERVAL = 30.0
+    MIN_GROWTH = 1024
+    
+    def __init__(self, model_name: str, dimension: int, cache_dir: str = EMBEDDING_CACHE_DIR,
+                 max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.cache_dir = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', model_name))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.owner_lock = self._claim(self.cache_dir)
+        if self.owner_lock is None:
+            logger.info(f"Embedding cache {self.cache_dir} is owned by another process; using a private cache")
+            self.cache_dir = tempfile.mkdtemp(prefix="embedding-cache-")
+            atexit.register(shutil.rmtree, self.cache_dir, True)
+        self.vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self.keys_path = os.path.join(self.cache_dir, "keys.bin")
+        self.index_path = os.path.join(self.cache_dir, "index.npz")
+        self.journal_path = os.path.join(self.cache_dir, "index.journal")
+        
+        self.lock = threading.Lock()
+        self.index = OrderedDict()
+        self.next_row = 0
+        self.capacity = 0
+        self.vectors = None
+        self.row_keys = None
+        self.hits = 0
+        self.misses = 0
+        self.pending = []
+        self.journal_entries = 0
+        self.last_flush = time.time()
+        
+        self._load()
+        atexit.register(self.flush)
+    
+    @staticmethod
+    def _claim(cache_dir: str):
+        lock_file = open(os.path.join(cache_dir, "owner.lock"), 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+    
+    def _load(self):
+        try:
+            data = np.load(self.index_path)
+            if int(data['dimension']) != self.dimension:
+                raise ValueError("dimension mismatch")
+            keys = data['keys'].tolist()
+            rows = data['rows'].tolist()
+            self.next_row = int(data['next_row'])
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            keys, rows = [], []
+            self.next_row = 0
+            for path in (self.vectors_path, self.keys_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        owners = OrderedDict(zip(rows, keys))
+        journal = self._read_journal()
+        for key, row in zip(journal['key'].tolist(), journal['row'].tolist()):
+            owners.pop(row, None)
+            owners[row] = key
+            self.next_row = max(self.next_row, row + 1)
+        self.journal_entries = len(journal)
+        self.index = OrderedDict((key, row) for row, key in owners.items())
+        
+        if os.path.exists(self.vectors_path):
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dimension)
+            key_rows = os.path.getsize(self.keys_path) // KEY_BYTES if os.path.exists(self.keys_path) else 0
+            if rows < self.next_row or key_rows != rows:
+                self.index = OrderedDict()
+                self.next_row = 0
+                with open(self.keys_path, 'ab') as f:
+                    f.truncate(0)
+                    f.truncate(rows * KEY_BYTES)
+            self._open_vectors(rows)
+        
+        if self.row_keys is None:
+            self.index = OrderedDict()
+            self.next_row = 0
+        elif self.index:
+            rows = np.fromiter(self.index.values(), dtype=np.int64, count=len(self.index))
+            valid = self.row_keys[rows] == np.array(list(self.index), dtype=f'S{KEY_BYTES}')
+            if not valid.all():
+                self.index = OrderedDict(item for item, ok in zip(self.index.items(), valid) if ok)
+        if not os.path.exists(self.index_path):
+            self._write_snapshot()
+    
+    def _read_journal(self) -> np.ndarray:
+        try:
+            raw = np.fromfile(self.journal_path, dtype=np.uint8)
+        except FileNotFoundError:
+            return np.zeros(0, dtype=JOURNAL_DTYPE)
+        usable = len(raw) // JOURNAL_DTYPE.itemsize * JOURNAL_DTYPE.itemsize
+        if usable != len(raw):
+            with open(self.journal_path, 'ab') as f:
+                f.truncate(usable)
+        return raw[:usable].view(JOURNAL_DTYPE)
+    
+    def _open_vectors(self, rows: int):
+        self.capacity = rows
+        if rows:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(rows, self.dimension))
+            self.row_keys = np.memmap(self.keys_path, dtype=f'S{KEY_BYTES}', mode='r+', shape=(rows,))
+        else:
+            self.vectors = None
+            self.row_keys = None
+    
+    def _ensure_capacity(self, rows: int):
+        if rows <= self.capacity:
+            return
+        new_capacity = min(self.max_entries, max(rows, self.capacity * 2, self.MIN_GROWTH))
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.row_keys.flush()
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(new_capacity * self.dimension * 4)
+        with open(self.keys_path, 'ab') as f:
+            f.truncate(new_capacity * KEY_BYTES)
+        self._open_vectors(new_capacity)
+    
+    def _allocate_row(self, key: bytes) -> int:
+        row = self.index.get(key)
+        if row is not None:
+            self.index.move_to_end(key)
+            return row
+        
+        if self.next_row < self.max_entries:
+            row = self.next_row
+            self.next_row += 1
+            self._ensure_capacity(self.next_row)
+        else:
+            _, row = self.index.popitem(last=False)
+        self.index[key] = row
+        return row
+    
+    def make_keys(self, texts: List[str]) -> List[bytes]:
+        prefix = f"{self.model_name}\0".encode()
+        return [hashlib.sha1(prefix + text.encode('utf-8')).hexdigest().encode() for text in texts]
+    
+    def get_many(self, keys: List[bytes]) -> Tuple[np.ndarray, List[int]]:
+        embeddings = np.zeros((len(keys), self.dimension), dtype=np.float32)
+        hit_positions = []
+        hit_rows = []
+        misses = []
+        
+        with self.lock:
+            for i, key in enumerate(keys):
+                row = self.index.get(key)
+                if row is None:
+                    misses.append(i)
+                else:
+                    self.index.move_to_end(key)
+                    hit_positions.append(i)
+                    hit_rows.append(row)
+            
+            if hit_rows:
+                stale = self.row_keys[hit_rows] != np.array([keys[i] for i in hit_positions], dtype=f'S{KEY_BYTES}')
+                for j in np.flatnonzero(stale)[::-1]:
+                    del self.index[keys[hit_positions[j]]]
+                    misses.append(hit_positions.pop(j))
+                    hit_rows.pop(j)
+                misses.sort()
+            
+            if hit_rows:
+                embeddings[hit_positions] = self.vectors[hit_rows]
+            self.hits += len(hit_rows)
+            self.misses += len(misses)
+        
+        return embeddings, misses
+    
+    def put_many(self, keys: List[bytes], embeddings: np.ndarray):
+        if not keys:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        
+        with self.lock:
+            rows = [self._allocate_row(key) for key in keys]
+            self.vectors[rows] = embeddings
+            self.row_keys[rows] = keys
+            self.pending.extend(zip(keys, rows))
+            should_flush = (len(self.pending) >= self.FLUSH_EVERY
+                            or time.time() - self.last_flush >= self.FLUSH_INTERVAL)
+        
+        if should_flush:
+            self.flush()
+    
+    def _write_snapshot(self):
+        keys = np.array(list(self.index.keys()), dtype=f'S{KEY_BYTES}')
+        rows = np.fromiter(self.index.values(), dtype=np.int32, count=len(self.index))
+        tmp_path = f"{self.index_path}.tmp.npz"
+        np.savez(tmp_path, keys=keys, rows=rows, next_row=self.next_row, dimension=self.dimension)
+        os.replace(tmp_path, self.index_path)
+        with open(self.journal_path, 'ab') as f:
+            f.truncate(0)
+        self.journal_entries = 0
+    
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            if self.vectors is not None:
+                self.vectors.flush()
+                self.row_keys.flush()
+            
+            if self.journal_entries + len(self.pending) > max(len(self.index), self.MIN_GROWTH):
+                self._write_snapshot()
+            else:
+                with open(self.journal_path, 'ab') as f:
+                    f.write(np.array(self.pending, dtype=JOURNAL_DTYPE).tobytes())
+                self.journal_entries += len(self.pending)
+            
+            self.pending = []
+            self.last_flush = time.time()
+    
+    def clear(self):
+        with self.lock:
+            self.index = OrderedDict()
+            self.next_row = 0
+            self.pending = []
+            self._write_snapshot()
+    
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.index),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
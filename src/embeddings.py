@@ -1,20 +1,34 @@
-from sentence_transformers import SentenceTransformer
 from typing import List
 import numpy as np
 from config.config import EMBEDDING_MODEL
+from src.embedding_cache import EmbeddingCache
 
 class EmbeddingGenerator:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
+        from sentence_transformers import SentenceTransformer
+        
         self.model = SentenceTransformer(EMBEDDING_MODEL)
         self.dimension = self.model.get_sentence_embedding_dimension()
+        self.cache = EmbeddingCache(EMBEDDING_MODEL, self.dimension) if use_cache else None
     
-    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
-        embeddings = self.model.encode(texts, show_progress_bar=True)
+    def generate_embeddings(self, texts: List[str], show_progress_bar: bool = True) -> np.ndarray:
+        if self.cache is None:
+            return self.model.encode(texts, show_progress_bar=show_progress_bar)
+        
+        keys = self.cache.make_keys(texts)
+        embeddings, misses = self.cache.get_many(keys)
+        if misses:
+            encoded = self.model.encode([texts[i] for i in misses], show_progress_bar=show_progress_bar)
+            embeddings[misses] = encoded
+            self.cache.put_many([keys[i] for i in misses], encoded)
         return embeddings
     
     def generate_single_embedding(self, text: str) -> np.ndarray:
-        embedding = self.model.encode([text])[0]
+        embedding = self.generate_embeddings([text], show_progress_bar=False)[0]
         return embedding
     
     def get_embedding_dimension(self) -> int:
         return self.dimension
+    
+    def get_cache_stats(self) -> dict:
+        return self.cache.get_stats() if self.cache else {}
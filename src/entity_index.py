@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+from array import array
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from config.config import ENTITY_INDEX_DIR
+
+def parse_entity_filters(text: str) -> List[Tuple[str, str]]:
+    filters = []
+    for part in text.split(","):
+        if "=" in part:
+            entity_type, value = part.split("=", 1)
+            if entity_type.strip() and value.strip():
+                filters.append((entity_type.strip().upper(), value.strip()))
+    return filters
+
+class EntityIndex:
+    def __init__(self, index_dir: str = ENTITY_INDEX_DIR):
+        self.index_dir = index_dir
+        self.lock = threading.RLock()
+        self._reset()
+    
+    def _reset(self):
+        self.entity_keys = {}
+        self.entities = []
+        self.postings_chunks = []
+        self.postings_counts = []
+        self.chunk_ids = []
+        self.chunk_index = {}
+        self.chunk_docs = array('i')
+        self.live = bytearray()
+        self.documents = []
+        self.document_index = {}
+        self.document_chunks = Counter()
+    
+    @staticmethod
+    def _entity_key(entity_type: str, text: str) -> str:
+        return f"{entity_type}\0{' '.join(text.lower().split())}"
+    
+    def has_document(self, filename: str, expected_chunks: int) -> bool:
+        return self.document_chunks.get(filename, 0) >= expected_chunks
+    
+    def missing_chunks(self, chunk_ids: List[str]) -> List[str]:
+        with self.lock:
+            return [chunk_id for chunk_id in chunk_ids if chunk_id not in self.chunk_index]
+    
+    def add(self, chunk_ids: List[str], filenames: List[str], entity_lists: List[Dict[str, List[str]]]):
+        with self.lock:
+            for chunk_id, filename, entities in zip(chunk_ids, filenames, entity_lists):
+                if chunk_id in self.chunk_index:
+                    continue
+                
+                doc_position = self.document_index.get(filename)
+                if doc_position is None:
+                    doc_position = len(self.documents)
+                    self.document_index[filename] = doc_position
+                    self.documents.append(filename)
+                
+                position = len(self.chunk_ids)
+                self.chunk_ids.append(chunk_id)
+                self.chunk_index[chunk_id] = position
+                self.chunk_docs.append(doc_position)
+                self.live.append(1)
+                self.document_chunks[filename] += 1
+                
+                counts = Counter()
+                for entity_type, values in entities.items():
+                    for value in values:
+                        counts[(entity_type, value)] += 1
+                
+                merged = {}
+                for (entity_type, value), count in counts.items():
+                    key = self._entity_key(entity_type, value)
+                    if key not in merged:
+                        merged[key] = [entity_type, value, 0]
+                    merged[key][2] += count
+                
+                for key, (entity_type, value, count) in merged.items():
+                    entity_id = self.entity_keys.get(key)
+                    if entity_id is None:
+                        entity_id = len(self.entities)
+                        self.entity_keys[key] = entity_id
+                        self.entities.append((entity_type, value))
+                        self.postings_chunks.append(array('i'))
+                        self.postings_counts.append(array('i'))
+                    self.postings_chunks[entity_id].append(position)
+                    self.postings_counts[entity_id].append(count)
+    
+    def remove(self, chunk_ids: List[str]):
+        with self.lock:
+            for chunk_id in chunk_ids:
+                position = self.chunk_index.pop(chunk_id, None)
+                if position is not None:
+                    self.live[position] = 0
+                    self.document_chunks[self.documents[self.chunk_docs[position]]] -= 1
+    
+    def clear(self):
+        with self.lock:
+            self._reset()
+    
+    def get_chunk_ids(self, filters: List[Tuple[str, str]]) -> List[str]:
+        with self.lock:
+            live = np.frombuffer(self.live, dtype=np.uint8).astype(bool)
+            candidates = None
+            for entity_type, value in filters:
+                entity_id = self.entity_keys.get(self._entity_key(entity_type, value))
+                if entity_id is None:
+                    return []
+                chunks = np.frombuffer(self.postings_chunks[entity_id], dtype=np.int32)
+                chunks = chunks[live[chunks]]
+                candidates = chunks if candidates is None else np.intersect1d(candidates, chunks, assume_unique=True)
+            if candidates is None:
+                return []
+            return [self.chunk_ids[position] for position in candidates]
+    
+    def _entity_counts(self, filename: Optional[str] = None) -> Dict[str, Counter]:
+        live = np.frombuffer(self.live, dtype=np.uint8).astype(bool)
+        if filename is not None:
+            doc_position = self.document_index.get(filename)
+            if doc_position is None:
+                return {}
+            live &= np.frombuffer(self.chunk_docs, dtype=np.int32) == doc_position
+        
+        counts = {}
+        for entity_id, (entity_type, value) in enumerate(self.entities):
+            chunks = np.frombuffer(self.postings_chunks[entity_id], dtype=np.int32)
+            occurrences = np.frombuffer(self.postings_counts[entity_id], dtype=np.int32)[live[chunks]]
+            if len(occurrences):
+                counts.setdefault(entity_type, Counter())[value] = int(occurrences.sum())
+        return counts
+    
+    def document_summary(self, filename: str) -> Dict:
+        with self.lock:
+            counts = self._entity_counts(filename)
+        
+        summary = {}
+        for entity_type, counter in counts.items():
+            summary[entity_type] = {
+                "count": sum(counter.values()),
+                "unique": len(counter),
+                "most_common": counter.most_common(5)
+            }
+        return summary
+    
+    def corpus_summary(self, top_n: int = 10) -> Dict:
+        with self.lock:
+            counts = self._entity_counts()
+        return {entity_type: counter.most_common(top_n) for entity_type, counter in counts.items()}
+    
+    def save(self):
+        with self.lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            offsets = np.zeros(len(self.entities) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(chunks) for chunks in self.postings_chunks], dtype=np.int64)
+            
+            arrays_path = os.path.join(self.index_dir, "postings.npz")
+            np.savez(
+                f"{arrays_path}.tmp.npz",
+                offsets=offsets,
+                chunks=np.frombuffer(b''.join(a.tobytes() for a in self.postings_chunks), dtype=np.int32),
+                counts=np.frombuffer(b''.join(a.tobytes() for a in self.postings_counts), dtype=np.int32),
+                chunk_docs=np.frombuffer(self.chunk_docs.tobytes(), dtype=np.int32),
+                live=np.frombuffer(bytes(self.live), dtype=np.uint8)
+            )
+            
+            meta_path = os.path.join(self.index_dir, "meta.json")
+            with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump({"entities": self.entities, "chunk_ids": self.chunk_ids, "documents": self.documents}, f)
+            
+            os.replace(f"{arrays_path}.tmp.npz", arrays_path)
+            os.replace(f"{meta_path}.tmp", meta_path)
+    
+    def load(self) -> bool:
+        arrays_path = os.path.join(self.index_dir, "postings.npz")
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        with self.lock:
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                data = np.load(arrays_path)
+                offsets, chunks, counts = data['offsets'], data['chunks'], data['counts']
+                chunk_docs, live = data['chunk_docs'], data['live']
+            except (FileNotFoundError, KeyError, ValueError, OSError):
+                self._reset()
+                return False
+            
+            self._reset()
+            self.entities = [tuple(entity) for entity in meta['entities']]
+            self.entity_keys = {self._entity_key(*entity): entity_id for entity_id, entity in enumerate(self.entities)}
+            for start, end in zip(offsets[:-1], offsets[1:]):
+                self.postings_chunks.append(array('i', chunks[start:end].tobytes()))
+                self.postings_counts.append(array('i', counts[start:end].tobytes()))
+            self.chunk_ids = meta['chunk_ids']
+            self.documents = meta['documents']
+            self.document_index = {filename: position for position, filename in enumerate(self.documents)}
+            self.chunk_docs = array('i', chunk_docs.astype(np.int32).tobytes())
+            self.live = bytearray(live.astype(np.uint8).tobytes())
+            for position, chunk_id in enumerate(self.chunk_ids):
+                if self.live[position]:
+                    self.chunk_index[chunk_id] = position
+                    self.document_chunks[self.documents[self.chunk_docs[position]]] += 1
+            return True
@@ -1,14 +1,51 @@
-import ollama
-from typing import List, Dict
+import asyncio
+import threading
+import weakref
+from contextlib import closing
+from typing import List, Dict, Iterator, AsyncIterator, Tuple
+from config.config import OLLAMA_MAX_IN_FLIGHT, OLLAMA_TIMEOUT
+from src.resources import registry
+
+_request_slots = threading.BoundedSemaphore(OLLAMA_MAX_IN_FLIGHT)
+_async_clients = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+def _client_options() -> Dict:
+    import httpx
+    
+    return {
+        "timeout": OLLAMA_TIMEOUT,
+        "limits": httpx.Limits(max_connections=OLLAMA_MAX_IN_FLIGHT, max_keepalive_connections=OLLAMA_MAX_IN_FLIGHT)
+    }
+
+def _create_client():
+    import ollama
+    
+    return ollama.Client(**_client_options())
+
+def _get_async_client() -> Tuple["ollama.AsyncClient", asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        entry = _async_clients.get(loop)
+        if entry is None:
+            import ollama
+            
+            entry = (ollama.AsyncClient(**_client_options()), asyncio.Semaphore(OLLAMA_MAX_IN_FLIGHT))
+            _async_clients[loop] = entry
+        return entry
 
 class LLMHandler:
     def __init__(self, model_name: str = "llama3.2:3b"):
         self.model_name = model_name
     
+    @property
+    def client(self):
+        return registry.get("ollama_client", _create_client)
+    
     def set_model(self, model_name: str):
         self.model_name = model_name
     
-    def generate_response(self, prompt: str, context: List[str]) -> str:
+    def build_prompt(self, prompt: str, context: List[str]) -> str:
         context_text = "\n\n".join([f"[Source {i+1}]: {ctx}" for i, ctx in enumerate(context)])
         
         full_prompt = f"""You are a helpful AI assistant that answers questions based on the provided context.
@@ -26,31 +63,67 @@ Instructions:
 
 Answer:"""
         
-        response = ollama.generate(
-            model=self.model_name,
-            prompt=full_prompt
-        )
+        return full_prompt
+    
+    def generate(self, prompt: str) -> str:
+        with _request_slots:
+            response = self.client.generate(
+                model=self.model_name,
+                prompt=prompt
+            )
         
         return response['response']
     
-    def summarize_document(self, text: str) -> str:
-        prompt = f"""Summarize the following document in a concise manner. Focus on the key points and main ideas.
-
-Document:
-{text[:4000]}
-
-Summary:"""
-        
-        response = ollama.generate(
-            model=self.model_name,
-            prompt=prompt
-        )
+    def generate_response(self, prompt: str, context: List[str]) -> str:
+        return self.generate(self.build_prompt(prompt, context))
+    
+    def stream(self, prompt: str) -> Iterator[str]:
+        with _request_slots:
+            stream = self.client.generate(
+                model=self.model_name,
+                prompt=prompt,
+                stream=True
+            )
+            
+            with closing(stream):
+                for chunk in stream:
+                    token = chunk.get('response', '')
+                    if token:
+                        yield token
+    
+    def stream_response(self, prompt: str, context: List[str]) -> Iterator[str]:
+        return self.stream(self.build_prompt(prompt, context))
+    
+    async def agenerate(self, prompt: str) -> str:
+        client, slots = _get_async_client()
+        async with slots:
+            response = await client.generate(
+                model=self.model_name,
+                prompt=prompt
+            )
         
         return response['response']
     
+    async def agenerate_response(self, prompt: str, context: List[str]) -> str:
+        return await self.agenerate(self.build_prompt(prompt, context))
+    
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        client, slots = _get_async_client()
+        async with slots:
+            stream = await client.generate(
+                model=self.model_name,
+                prompt=prompt,
+                stream=True
+            )
+            
+            async for chunk in stream:
+                token = chunk.get('response', '')
+                if token:
+                    yield token
+    
     def check_model_availability(self) -> bool:
         try:
-            ollama.list()
+            self.client.list()
             return True
         except:
             return False
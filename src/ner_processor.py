@@ -1,33 +1,108 @@
-import spacy
-from typing import List, Dict
+from typing import List, Dict, Optional
 from collections import Counter
+import hashlib
+import json
+import os
+from src.resources import registry
+from config.config import ENTITY_CACHE_DIR, NER_BATCH_SIZE, NER_PROCESSES, NER_SEGMENT_CHARS
 
-class NERProcessor:
-    def __init__(self):
+SPACY_MODEL = "en_core_web_sm"
+DISABLED_PIPES = ["tagger", "parser", "attribute_ruler", "lemmatizer"]
+ENTITY_TYPES = ["PERSON", "ORG", "DATE", "MONEY", "GPE", "PRODUCT"]
+
+def _load_spacy_model():
+    import spacy
+    
+    try:
+        return spacy.load(SPACY_MODEL, disable=DISABLED_PIPES)
+    except OSError:
+        from spacy.cli import download
+        download(SPACY_MODEL)
+        return spacy.load(SPACY_MODEL, disable=DISABLED_PIPES)
+
+def split_segments(text: str, max_chars: int = NER_SEGMENT_CHARS) -> List[str]:
+    segments = []
+    start = 0
+    while len(text) - start > max_chars:
+        end = start + max_chars
+        boundary = max(text.rfind("\n", start, end), text.rfind(" ", start, end))
+        if boundary <= start:
+            boundary = end
+        segments.append(text[start:boundary])
+        start = boundary
+    segments.append(text[start:])
+    return segments
+
+class EntityCache:
+    def __init__(self, cache_dir: str = ENTITY_CACHE_DIR):
+        self.cache_dir = cache_dir
+    
+    def make_key(self, text: str) -> str:
+        return hashlib.sha1(f"{SPACY_MODEL}\0{text}".encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+    
+    def get(self, key: str) -> Optional[Dict[str, List[str]]]:
         try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except:
-            import os
-            os.system("python -m spacy download en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def set(self, key: str, entities: Dict[str, List[str]]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entities, f)
+        os.replace(tmp_path, path)
+
+class NERProcessor:
+    def __init__(self, use_cache: bool = True):
+        self.cache = EntityCache() if use_cache else None
+    
+    @staticmethod
+    def warm_up():
+        registry.warm_up({f"spacy:{SPACY_MODEL}": _load_spacy_model})
+    
+    @property
+    def nlp(self):
+        return registry.get(f"spacy:{SPACY_MODEL}", _load_spacy_model)
     
     def extract_entities(self, text: str) -> Dict[str, List[str]]:
-        doc = self.nlp(text)
+        return self.extract_entities_batch([text])[0]
+    
+    def extract_entities_batch(self, texts: List[str], batch_size: int = NER_BATCH_SIZE,
+                               n_process: int = NER_PROCESSES) -> List[Dict[str, List[str]]]:
+        results = [None] * len(texts)
+        keys = [self.cache.make_key(text) for text in texts] if self.cache else [None] * len(texts)
+        
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                results[i] = {entity_type: [] for entity_type in ENTITY_TYPES}
+                pending.append(i)
+        
+        if not pending:
+            return results
         
-        entities = {
-            "PERSON": [],
-            "ORG": [],
-            "DATE": [],
-            "MONEY": [],
-            "GPE": [],
-            "PRODUCT": []
-        }
+        segments = [(i, segment) for i in pending for segment in split_segments(texts[i])]
+        docs = self.nlp.pipe((segment for _, segment in segments), batch_size=batch_size, n_process=n_process)
+        for (i, _), doc in zip(segments, docs):
+            entities = results[i]
+            for ent in doc.ents:
+                if ent.label_ in entities:
+                    entities[ent.label_].append(ent.text)
         
-        for ent in doc.ents:
-            if ent.label_ in entities:
-                entities[ent.label_].append(ent.text)
+        if self.cache:
+            for i in pending:
+                self.cache.set(keys[i], results[i])
         
-        return entities
+        return results
     
     def get_entity_summary(self, text: str) -> Dict:
         entities = self.extract_entities(text)
@@ -45,17 +120,9 @@ class NERProcessor:
         return summary
     
     def extract_from_multiple_docs(self, documents: List[str]) -> Dict:
-        all_entities = {
-            "PERSON": [],
-            "ORG": [],
-            "DATE": [],
-            "MONEY": [],
-            "GPE": [],
-            "PRODUCT": []
-        }
+        all_entities = {entity_type: [] for entity_type in ENTITY_TYPES}
         
-        for doc_text in documents:
-            entities = self.extract_entities(doc_text)
+        for entities in self.extract_entities_batch(documents):
             for entity_type, values in entities.items():
                 all_entities[entity_type].extend(values)
         
@@ -1,100 +1,387 @@
-from functools import lru_cache
+from contextlib import contextmanager
+from functools import wraps
 import hashlib
+import threading
 import time
-from typing import Tuple, List, Dict
+from collections import OrderedDict
+import asyncio
+from typing import Any, Callable, Hashable, Iterator, Tuple, List, Dict, Optional
 import logging
+import numpy as np
+from config.config import QUERY_CACHE_SIMILARITY_THRESHOLD, QUERY_CACHE_TTL, PERF_WINDOW_SIZE
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class QueryCache:
-    def __init__(self, max_size: int = 100):
-        self.cache = {}
+    def __init__(self, max_size: int = 100, similarity_threshold: float = QUERY_CACHE_SIMILARITY_THRESHOLD,
+                 ttl: Optional[float] = QUERY_CACHE_TTL):
+        self.cache = OrderedDict()
         self.max_size = max_size
-        self.access_times = {}
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embeddings = None
+        self.row_keys = [None] * max_size
+        self.free_rows = list(range(max_size - 1, -1, -1))
+        self.key_rows = {}
+        self.corpus_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.RLock()
     
-    def _get_cache_key(self, query: str) -> str:
-        return hashlib.md5(query.lower().encode()).hexdigest()
+    def _get_cache_key(self, query: str, model_name: str = "") -> str:
+        return hashlib.md5(f"{model_name}\0{query.lower()}".encode()).hexdigest()
     
-    def get(self, query: str) -> Tuple[str, List[Dict]] | None:
-        key = self._get_cache_key(query)
-        if key in self.cache:
-            self.access_times[key] = time.time()
-            logger.info(f"Cache hit for query: {query[:50]}")
-            return self.cache[key]
+    def key(self, query: str, model_name: str = "") -> Tuple[str, int]:
+        return self._get_cache_key(query, model_name), self.corpus_version
+    
+    def _normalize(self, embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _is_fresh(self, entry: Dict) -> bool:
+        if entry["corpus_version"] != self.corpus_version:
+            return False
+        return self.ttl is None or time.time() - entry["created_at"] <= self.ttl
+    
+    def _semantic_lookup(self, embedding, model_name: str) -> Optional[str]:
+        if self.embeddings is None or not self.key_rows:
+            return None
+        similarities = self.embeddings @ self._normalize(embedding)
+        candidates = np.flatnonzero(similarities >= self.similarity_threshold)
+        for row in candidates[np.argsort(-similarities[candidates])]:
+            key = self.row_keys[row]
+            if key is not None and self.cache[key]["model_name"] == model_name:
+                return key
         return None
     
-    def set(self, query: str, result: Tuple[str, List[Dict]]):
-        key = self._get_cache_key(query)
+    def _store_embedding(self, key: str, embedding):
+        vector = self._normalize(embedding)
+        if self.embeddings is None:
+            self.embeddings = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+        row = self.key_rows.get(key)
+        if row is None:
+            row = self.free_rows.pop()
+            self.key_rows[key] = row
+            self.row_keys[row] = key
+        self.embeddings[row] = vector
+    
+    def _remove(self, key: str):
+        del self.cache[key]
+        row = self.key_rows.pop(key, None)
+        if row is not None:
+            self.row_keys[row] = None
+            self.embeddings[row] = 0.0
+            self.free_rows.append(row)
+    
+    def get(self, query: str, embedding=None, model_name: str = "") -> Tuple[str, List[Dict]] | None:
+        with self.lock:
+            key = self._get_cache_key(query, model_name)
+            semantic = False
+            if key not in self.cache and embedding is not None:
+                key = self._semantic_lookup(embedding, model_name)
+                semantic = key is not None
+            
+            entry = self.cache.get(key) if key is not None else None
+            if entry is not None and not self._is_fresh(entry):
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self.cache.move_to_end(key)
+            self.hits += 1
         
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.access_times, key=self.access_times.get)
-            del self.cache[oldest_key]
-            del self.access_times[oldest_key]
+        logger.info(f"{'Semantic cache' if semantic else 'Cache'} hit for query: {query[:50]}")
+        return entry["result"]
+    
+    def set(self, query: str, result: Tuple[str, List[Dict]], embedding=None, model_name: str = "",
+            corpus_version: Optional[int] = None):
+        with self.lock:
+            if corpus_version is not None and corpus_version != self.corpus_version:
+                return
+            
+            key = self._get_cache_key(query, model_name)
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            elif len(self.cache) >= self.max_size:
+                oldest_key = next(iter(self.cache))
+                self._remove(oldest_key)
+                self.evictions += 1
+            
+            self.cache[key] = {
+                "result": result,
+                "model_name": model_name,
+                "corpus_version": self.corpus_version,
+                "created_at": time.time()
+            }
+            if embedding is not None:
+                self._store_embedding(key, embedding)
         
-        self.cache[key] = result
-        self.access_times[key] = time.time()
         logger.info(f"Cached result for query: {query[:50]}")
     
+    def bump_corpus_version(self) -> int:
+        with self.lock:
+            self.corpus_version += 1
+            return self.corpus_version
+    
     def clear(self):
-        self.cache.clear()
-        self.access_times.clear()
+        with self.lock:
+            self.cache.clear()
+            self.key_rows.clear()
+            self.row_keys = [None] * self.max_size
+            self.free_rows = list(range(self.max_size - 1, -1, -1))
+            self.embeddings = None
         logger.info("Cache cleared")
     
     def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
         return {
             "cache_size": len(self.cache),
             "max_size": self.max_size,
-            "hit_rate": "N/A"
+            "semantic_entries": len(self.key_rows),
+            "similarity_threshold": self.similarity_threshold,
+            "ttl": self.ttl,
+            "corpus_version": self.corpus_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
         }
 
-class PerformanceTracker:
+class _Flight:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.result = None
+        self.error = None
+        self.done = False
+        self.source = None
+        self.events = []
+        self.pulling = False
+        self.subscribers = 0
+
+class SingleFlight:
     def __init__(self):
-        self.metrics = {
-            "query_times": [],
-            "embedding_times": [],
-            "retrieval_times": [],
-            "generation_times": []
+        self.flights: Dict[Hashable, _Flight] = {}
+        self.tasks: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+    
+    def _join(self, key: Hashable) -> Tuple[_Flight, bool]:
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = _Flight()
+                self.leaders += 1
+                return flight, True
+            self.coalesced += 1
+            return flight, False
+    
+    def _finish(self, key: Hashable, flight: _Flight):
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+    
+    def do(self, key: Hashable, fn: Callable, *args) -> Any:
+        flight, leader = self._join(key)
+        if not leader:
+            with flight.condition:
+                while not flight.done:
+                    flight.condition.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            flight.result = fn(*args)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish(key, flight)
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+        return flight.result
+    
+    def stream(self, key: Hashable, fn: Callable[..., Iterator], *args) -> Iterator:
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = _Flight()
+                flight.source = fn(*args)
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+            with flight.condition:
+                flight.subscribers += 1
+        return self._subscribe(key, flight)
+    
+    def _subscribe(self, key: Hashable, flight: _Flight) -> Iterator:
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    while index >= len(flight.events) and not flight.done and flight.pulling:
+                        flight.condition.wait()
+                    if index < len(flight.events):
+                        event = flight.events[index]
+                    elif flight.done:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pulling = True
+                        event = None
+                
+                if event is None:
+                    self._pull(key, flight)
+                    continue
+                index += 1
+                yield event
+        finally:
+            with self.lock, flight.condition:
+                flight.subscribers -= 1
+                abandoned = not flight.subscribers and not flight.done
+                if abandoned:
+                    flight.done = True
+                    if self.flights.get(key) is flight:
+                        del self.flights[key]
+            if abandoned:
+                flight.source.close()
+    
+    def _pull(self, key: Hashable, flight: _Flight):
+        finished = False
+        try:
+            event = next(flight.source)
+        except StopIteration:
+            finished = True
+        except BaseException as e:
+            flight.error = e
+            finished = True
+        
+        if finished:
+            self._finish(key, flight)
+        with flight.condition:
+            if finished:
+                flight.done = True
+            else:
+                flight.events.append(event)
+            flight.pulling = False
+            flight.condition.notify_all()
+    
+    async def ado(self, key: Hashable, fn: Callable, *args) -> Any:
+        task_key = (id(asyncio.get_running_loop()), key)
+        with self.lock:
+            task = self.tasks.get(task_key)
+            if task is None:
+                task = self.tasks[task_key] = asyncio.ensure_future(fn(*args))
+                task.add_done_callback(lambda _: self._finish_task(task_key, task))
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    def _finish_task(self, task_key: Tuple[int, Hashable], task: asyncio.Task):
+        with self.lock:
+            if self.tasks.get(task_key) is task:
+                del self.tasks[task_key]
+    
+    def get_stats(self) -> Dict:
+        with self.lock:
+            joined = self.leaders + self.coalesced
+            return {
+                "in_flight": len(self.flights) + len(self.tasks),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_rate": self.coalesced / joined if joined else 0.0
+            }
+
+class MetricWindow:
+    def __init__(self, size: int = PERF_WINDOW_SIZE):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.position = 0
+        self.count = 0
+    
+    def add(self, value: float):
+        self.values[self.position] = value
+        self.position = (self.position + 1) % len(self.values)
+        self.count += 1
+    
+    def summary(self) -> Dict:
+        if not self.count:
+            return {"avg": 0, "min": 0, "max": 0, "p50": 0, "p95": 0, "p99": 0, "count": 0}
+        window = self.values[:min(self.count, len(self.values))]
+        p50, p95, p99 = np.percentile(window, [50, 95, 99])
+        return {
+            "avg": float(window.mean()),
+            "min": float(window.min()),
+            "max": float(window.max()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "count": self.count
         }
+
+class PerformanceTracker:
+    DEFAULT_METRICS = ["query_times", "embedding_times", "retrieval_times", "generation_times"]
+    
+    def __init__(self, window_size: int = PERF_WINDOW_SIZE):
+        self.window_size = window_size
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def record(self, metric_name: str, duration: float):
+        with self.lock:
+            window = self.metrics.get(metric_name)
+            if window is None:
+                window = self.metrics[metric_name] = MetricWindow(self.window_size)
+            window.add(duration)
+    
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(f"{stage}_times", time.perf_counter() - start)
     
     def track_query_time(self, duration: float):
-        self.metrics["query_times"].append(duration)
+        self.record("query_times", duration)
     
     def track_embedding_time(self, duration: float):
-        self.metrics["embedding_times"].append(duration)
+        self.record("embedding_times", duration)
     
     def track_retrieval_time(self, duration: float):
-        self.metrics["retrieval_times"].append(duration)
+        self.record("retrieval_times", duration)
     
     def track_generation_time(self, duration: float):
-        self.metrics["generation_times"].append(duration)
+        self.record("generation_times", duration)
     
     def get_metrics(self) -> Dict:
-        import numpy as np
-        
-        result = {}
-        for metric_name, values in self.metrics.items():
-            if values:
-                result[metric_name] = {
-                    "avg": float(np.mean(values)),
-                    "min": float(np.min(values)),
-                    "max": float(np.max(values)),
-                    "count": len(values)
-                }
-            else:
-                result[metric_name] = {"avg": 0, "min": 0, "max": 0, "count": 0}
-        
-        return result
+        with self.lock:
+            return {metric_name: window.summary() for metric_name, window in self.metrics.items()}
     
     def reset(self):
-        for key in self.metrics:
-            self.metrics[key] = []
+        with self.lock:
+            self.metrics = {metric_name: MetricWindow(self.window_size) for metric_name in self.DEFAULT_METRICS}
 
-def measure_time(func):
-    def wrapper(*args, **kwargs):
-        start = time.time()
-        result = func(*args, **kwargs)
-        duration = time.time() - start
-        logger.info(f"{func.__name__} took {duration:.2f}s")
-        return result, duration
-    return wrapper
+def measure_time(stage: str, tracker: Optional[PerformanceTracker] = None):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            from src.resources import registry
+            
+            active_tracker = tracker or registry.get("performance_tracker", PerformanceTracker)
+            with active_tracker.span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,141 +1,728 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator, Optional
+import asyncio
+import logging
+import os
+import queue
+import threading
 import time
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from src.document_processor import DocumentProcessor
 from src.embeddings import EmbeddingGenerator
-from src.vector_store import VectorStore
+from src.vector_store import VectorStore, make_chunk_ids
+from src.chunk_store import ChunkTextView
 from src.llm_handler import LLMHandler
-from src.performance import QueryCache, PerformanceTracker
+from src.performance import QueryCache, PerformanceTracker, SingleFlight, measure_time
 from src.advanced_features import ConfidenceScorer, DocumentComparison
+from src.ner_processor import NERProcessor
+from src.summarizer import MapReduceSummarizer
+from src.reranker import Reranker
+from src.resources import registry, IndexGeneration
+from config.config import (EMBEDDING_BATCH_SIZE, INGEST_QUEUE_SIZE, LLM_MAX_CONCURRENCY, INGEST_EXTRACT_ENTITIES, COMPARE_TOP_K,
+                           COMPARE_CONTEXT_CHARS, CONTRADICTION_PAIR_BUDGET, EARLY_EXIT_ENABLED, EARLY_EXIT_MIN_SCORE,
+                           EARLY_EXIT_MIN_RERANK_SCORE, NOT_FOUND_ANSWER,
+                           RETRIEVAL_TOP_K, RERANK_ENABLED, RERANK_CANDIDATES, SEARCH_MODE, ASYNC_EXECUTOR_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_CANDIDATES = RERANK_CANDIDATES if RERANK_ENABLED else RETRIEVAL_TOP_K
+
+def _create_async_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=ASYNC_EXECUTOR_WORKERS, thread_name_prefix="rag-async")
+
+def _create_vector_store() -> VectorStore:
+    generation = IndexGeneration().read()
+    vector_store = VectorStore()
+    vector_store.get_or_create_collection()
+    vector_store.generation = generation
+    return vector_store
 
 class RAGPipeline:
+    SHARED_RESOURCES = {
+        "embedding_generator": EmbeddingGenerator,
+        "vector_store": _create_vector_store,
+    }
+    REQUIRED_RESOURCES = list(SHARED_RESOURCES)
+    if RERANK_ENABLED:
+        SHARED_RESOURCES["reranker"] = Reranker
+    
     def __init__(self, model_name: str = "llama3.2:3b"):
         self.doc_processor = DocumentProcessor()
-        self.embedding_gen = EmbeddingGenerator()
-        self.vector_store = VectorStore()
         self.llm = LLMHandler(model_name)
-        self.vector_store.get_or_create_collection()
-        self.cache = QueryCache(max_size=100)
-        self.perf_tracker = PerformanceTracker()
+        self.cache = registry.get("query_cache", lambda: QueryCache(max_size=100))
+        self.perf_tracker = registry.get("performance_tracker", PerformanceTracker)
+        self.flights = registry.get("query_flights", SingleFlight)
+        self.index_generation = IndexGeneration()
         self.confidence_scorer = ConfidenceScorer()
         self.doc_comparison = DocumentComparison(self.llm)
+        self.summarizer = MapReduceSummarizer(self.llm)
+        self.ner = NERProcessor(use_cache=False)
+    
+    @classmethod
+    def warm_up(cls):
+        registry.warm_up(cls.SHARED_RESOURCES)
+    
+    @classmethod
+    def is_ready(cls) -> bool:
+        return registry.is_ready(cls.REQUIRED_RESOURCES)
+    
+    @property
+    def embedding_gen(self) -> EmbeddingGenerator:
+        return registry.get("embedding_generator", self.SHARED_RESOURCES["embedding_generator"])
+    
+    @property
+    def vector_store(self) -> VectorStore:
+        return registry.get("vector_store", self.SHARED_RESOURCES["vector_store"])
+    
+    @property
+    def reranker(self) -> Optional[Reranker]:
+        if not RERANK_ENABLED or registry.is_failed("reranker"):
+            return None
+        try:
+            return registry.get("reranker", Reranker)
+        except Exception as e:
+            logger.warning(f"Reranker unavailable, falling back to retrieval order: {e}")
+            return None
     
     def set_model(self, model_name: str):
         self.llm.set_model(model_name)
     
-    def ingest_documents(self, file_paths: List[str]) -> Dict:
-        processed_docs = self.doc_processor.process_multiple_documents(file_paths)
+    @contextmanager
+    def writing(self):
+        with self.index_generation.exclusive(), self.vector_store.write_lock:
+            if self.index_generation.read() != self.vector_store.generation:
+                self.reload_indexes()
+            try:
+                yield
+            finally:
+                self.vector_store.generation = self.index_generation.bump()
+    
+    def ingest_documents(self, file_paths: List[str], extract_entities: bool = INGEST_EXTRACT_ENTITIES) -> Dict:
+        with self.writing(), self.perf_tracker.span("ingest"):
+            return self._ingest_documents(file_paths, extract_entities)
+    
+    def _ingest_documents(self, file_paths: List[str], extract_entities: bool) -> Dict:
+        manifest = self.vector_store.manifest
+        file_info = {}
+        skipped = []
+        to_process = []
+        
+        for file_path in {os.path.basename(p): p for p in file_paths}.values():
+            filename = os.path.basename(file_path)
+            file_hash = self.doc_processor.compute_file_hash(file_path)
+            entry = manifest.get(filename)
+            if entry and entry['file_hash'] == file_hash:
+                skipped.append(filename)
+                continue
+            file_info[filename] = (file_hash, os.path.getmtime(file_path))
+            to_process.append(file_path)
+        
+        write_queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        write_errors = []
+        writer = threading.Thread(target=self._write_batches, args=(write_queue, write_errors), daemon=True)
+        writer.start()
         
-        all_chunks = []
-        all_metadatas = []
+        processed_docs = []
+        failed = []
+        manifest_updates = []
+        batch = ([], [], [])
+        num_chunks = 0
+        num_embedded = 0
         
-        for doc in processed_docs:
-            for i, chunk in enumerate(doc['chunks']):
-                all_chunks.append(chunk)
-                all_metadatas.append({
-                    "filename": doc['filename'],
-                    "chunk_id": i,
-                    "total_chunks": doc['num_chunks']
-                })
+        try:
+            for doc in self.doc_processor.iter_process_documents(to_process):
+                filename = doc['filename']
+                entry = manifest.get(filename)
+                previous_ids = set(entry['chunk_ids']) if entry else set()
+                chunk_ids = []
+                try:
+                    chunk_pages = []
+                    size_bytes = 0
+                    seen = {}
+                    unchanged_ids = []
+                    unchanged_metadatas = []
+                    for i, (chunk, page) in enumerate(doc['chunks']):
+                        chunk_id = make_chunk_ids(filename, [chunk], seen)[0]
+                        chunk_ids.append(chunk_id)
+                        chunk_pages.append(page)
+                        size_bytes += len(chunk.encode('utf-8'))
+                        metadata = self._chunk_metadata(filename, i, doc['num_chunks'], page)
+                        if chunk_id in previous_ids:
+                            unchanged_ids.append(chunk_id)
+                            unchanged_metadatas.append(metadata)
+                            continue
+                        
+                        batch[0].append(chunk_id)
+                        batch[1].append(chunk)
+                        batch[2].append(metadata)
+                        if len(batch[0]) >= EMBEDDING_BATCH_SIZE:
+                            num_embedded += self._embed_batch(batch, write_queue, extract_entities)
+                            batch = ([], [], [])
+                    
+                    if doc['num_chunks'] is None:
+                        if batch[0]:
+                            num_embedded += self._embed_batch(batch, write_queue, extract_entities)
+                            batch = ([], [], [])
+                        unchanged_ids = chunk_ids
+                        unchanged_metadatas = [
+                            self._chunk_metadata(filename, i, len(chunk_ids), page)
+                            for i, page in enumerate(chunk_pages)
+                        ]
+                    
+                    if unchanged_ids:
+                        write_queue.put((self.vector_store.update_metadatas, (unchanged_ids, unchanged_metadatas)))
+                    stale_ids = list(previous_ids.difference(chunk_ids))
+                    if stale_ids:
+                        write_queue.put((self.vector_store.delete_ids, (stale_ids,)))
+                    
+                    file_hash, mtime = file_info[filename]
+                    manifest_updates.append((filename, file_hash, chunk_ids, mtime, size_bytes))
+                    num_chunks += len(chunk_ids)
+                    processed_docs.append({
+                        "filename": filename,
+                        "num_chunks": len(chunk_ids)
+                    })
+                except Exception as e:
+                    logger.exception(f"Error processing {filename}")
+                    doc_ids = set(chunk_ids)
+                    keep = [i for i, chunk_id in enumerate(batch[0]) if chunk_id not in doc_ids]
+                    unwritten = doc_ids.intersection(batch[0]).union(previous_ids)
+                    batch = tuple([column[i] for i in keep] for column in batch)
+                    written_ids = [chunk_id for chunk_id in chunk_ids if chunk_id not in unwritten]
+                    if written_ids:
+                        write_queue.put((self.vector_store.delete_ids, (written_ids,)))
+                    failed.append({"filename": filename, "error": str(e)})
+            
+            if batch[0]:
+                num_embedded += self._embed_batch(batch, write_queue, extract_entities)
+        finally:
+            write_queue.put(None)
+            writer.join()
         
-        embeddings = self.embedding_gen.generate_embeddings(all_chunks)
+        if write_errors:
+            raise write_errors[0]
         
-        self.vector_store.add_documents(all_chunks, all_metadatas, embeddings.tolist())
+        for update in manifest_updates:
+            manifest.set(*update)
+        if manifest_updates:
+            with self.perf_tracker.span("ingest_persist"):
+                manifest.save()
+                self.vector_store.persist()
+            self.cache.bump_corpus_version()
         
         return {
             "num_documents": len(processed_docs),
-            "num_chunks": len(all_chunks),
+            "num_chunks": num_chunks,
+            "num_embedded": num_embedded,
             "documents": [doc['filename'] for doc in processed_docs],
+            "skipped_documents": skipped,
+            "failed_documents": failed,
             "processed_docs": processed_docs
         }
     
-    def query(self, question: str, use_cache: bool = True) -> Tuple[str, List[Dict], Dict]:
-        start_time = time.time()
-        
-        if use_cache:
-            cached_result = self.cache.get(question)
-            if cached_result:
-                answer, sources = cached_result
-                confidence = self.confidence_scorer.calculate_confidence(sources, answer)
-                return answer, sources, confidence
-        
-        query_embedding = self.embedding_gen.generate_single_embedding(question)
+    def _chunk_metadata(self, filename: str, chunk_id: int, total_chunks: Optional[int], page: Optional[int]) -> Dict:
+        metadata = {
+            "filename": filename,
+            "chunk_id": chunk_id,
+            "total_chunks": total_chunks if total_chunks is not None else 0
+        }
+        if page is not None:
+            metadata["page"] = page
+        return metadata
+    
+    def _embed_batch(self, batch: Tuple[List[str], List[str], List[Dict]], write_queue: queue.Queue,
+                     extract_entities: bool = False) -> int:
+        ids, chunks, metadatas = batch
+        with self.perf_tracker.span("ingest_embedding"):
+            embeddings = self.embedding_gen.generate_embeddings(chunks, show_progress_bar=False)
+        write_queue.put((self.vector_store.upsert_documents, (ids, chunks, metadatas, embeddings.tolist())))
+        if extract_entities:
+            write_queue.put((self._index_entities, (ids, chunks, [meta['filename'] for meta in metadatas])))
+        return len(ids)
+    
+    def _index_entities(self, ids: List[str], chunks: List[str], filenames: List[str]):
+        with self.perf_tracker.span("ingest_entities"):
+            entity_lists = self.ner.extract_entities_batch(chunks)
+        self.vector_store.entity_index.add(ids, filenames, entity_lists)
+    
+    def _write_batches(self, write_queue: queue.Queue, write_errors: List[Exception]):
+        while True:
+            batch = write_queue.get()
+            if batch is None:
+                break
+            if write_errors:
+                continue
+            write_fn, args = batch
+            try:
+                with self.perf_tracker.span("ingest_write"):
+                    write_fn(*args)
+            except Exception as e:
+                write_errors.append(e)
+    
+    def _embed_query(self, question: str):
+        with self.perf_tracker.span("embedding"):
+            return self.embedding_gen.generate_single_embedding(question)
+    
+    def _retrieve(self, question: str, query_embedding,
+                  entity_filters: Optional[List[Tuple[str, str]]] = None,
+                  sparse_ranking: Optional[List[str]] = None) -> Tuple[List[str], List[Dict]]:
+        if entity_filters:
+            unindexed = self.get_unindexed_documents()
+            if unindexed:
+                raise ValueError(f"Entity filters need an entity index; index these documents first: {', '.join(unindexed)}")
         
-        search_results = self.vector_store.search(query_embedding.tolist())
+        with self.perf_tracker.span("retrieval"):
+            search_results = self.vector_store.search(
+                query_embedding.tolist(),
+                top_k=RETRIEVAL_CANDIDATES,
+                query_text=question,
+                entity_filters=entity_filters,
+                sparse_ranking=sparse_ranking
+            )
         
-        contexts = search_results['documents'][0]
-        metadatas = search_results['metadatas'][0]
+        return self._select_contexts(question, search_results, 0)
+    
+    def _select_contexts(self, question: str, search_results: Dict, row: int,
+                         top_k: int = RETRIEVAL_TOP_K) -> Tuple[List[str], List[Dict]]:
+        ids = search_results['ids'][row]
+        contexts = search_results['documents'][row]
+        metadatas = search_results['metadatas'][row]
+        distances = search_results['distances'][row]
         
-        answer = self.llm.generate_response(question, contexts)
+        rerank_scores = None
+        reranker = self.reranker
+        if reranker is not None:
+            with self.perf_tracker.span("rerank"):
+                ranked = reranker.rerank(question, ids, contexts, top_k)
+            contexts = [contexts[i] for i, _ in ranked]
+            metadatas = [metadatas[i] for i, _ in ranked]
+            distances = [distances[i] for i, _ in ranked]
+            rerank_scores = [score for _, score in ranked]
+        else:
+            contexts, metadatas, distances = contexts[:top_k], metadatas[:top_k], distances[:top_k]
         
+        return contexts, self._build_sources(contexts, metadatas, distances, rerank_scores)
+    
+    def _build_sources(self, contexts: List[str], metadatas: List[Dict],
+                       distances: Optional[List[float]] = None,
+                       rerank_scores: Optional[List[float]] = None) -> List[Dict]:
         sources = []
         for i, (ctx, meta) in enumerate(zip(contexts, metadatas)):
-            sources.append({
+            source = {
                 "source_number": i + 1,
                 "filename": meta['filename'],
                 "chunk_id": meta['chunk_id'],
+                "page": meta.get('page'),
+                "score": 1.0 - distances[i] if distances else None,
                 "text": ctx[:200] + "..." if len(ctx) > 200 else ctx
-            })
+            }
+            if rerank_scores is not None:
+                source["rerank_score"] = rerank_scores[i]
+            sources.append(source)
+        
+        return sources
+    
+    def _should_exit_early(self, sources: List[Dict], early_exit: bool) -> bool:
+        if not early_exit:
+            return False
+        if not sources:
+            return True
+        rerank_scores = [source['rerank_score'] for source in sources if 'rerank_score' in source]
+        if rerank_scores:
+            return max(rerank_scores) < EARLY_EXIT_MIN_RERANK_SCORE
+        if SEARCH_MODE == "hybrid":
+            return False
+        scores = [source['score'] for source in sources if source['score'] is not None]
+        return len(scores) == len(sources) and max(scores) < EARLY_EXIT_MIN_SCORE
+    
+    def _generate_answer(self, question: str, contexts: List[str]) -> str:
+        with self.perf_tracker.span("prompt_build"):
+            prompt = self.llm.build_prompt(question, contexts)
+        with self.perf_tracker.span("generation"):
+            return self.llm.generate(prompt)
+    
+    def _stream_answer(self, question: str, contexts: List[str]) -> Iterator[str]:
+        with self.perf_tracker.span("prompt_build"):
+            prompt = self.llm.build_prompt(question, contexts)
+        
+        start_time = time.perf_counter()
+        first_token = True
+        with closing(self.llm.stream(prompt)) as tokens:
+            for token in tokens:
+                if first_token:
+                    self.perf_tracker.record("first_token_times", time.perf_counter() - start_time)
+                    first_token = False
+                yield token
+        self.perf_tracker.record("generation_times", time.perf_counter() - start_time)
+    
+    def _lookup_cache(self, question: str, query_embedding, model_name: str) -> Optional[Tuple[str, List[Dict]]]:
+        with self.perf_tracker.span("cache_lookup"):
+            return self.cache.get(question, query_embedding, model_name)
+    
+    def _flight_key(self, kind: str, question: str, model_name: str, early_exit: bool) -> Tuple:
+        return (kind, *self.cache.key(question, model_name), early_exit)
+    
+    def _answer(self, question: str, model_name: str, corpus_version: int, use_cache: bool,
+                entity_filters: Optional[List[Tuple[str, str]]], early_exit: bool) -> Tuple[str, List[Dict]]:
+        query_embedding = self._embed_query(question)
+        
+        if use_cache:
+            cached_result = self._lookup_cache(question, query_embedding, model_name)
+            if cached_result:
+                return cached_result
+        
+        contexts, sources = self._retrieve(question, query_embedding, entity_filters)
+        
+        exited_early = self._should_exit_early(sources, early_exit)
+        if exited_early:
+            answer = NOT_FOUND_ANSWER
+        else:
+            answer = self._generate_answer(question, contexts)
+        
+        if use_cache and not exited_early:
+            self.cache.set(question, (answer, sources), query_embedding, model_name, corpus_version)
+        
+        return answer, sources
+    
+    def query(self, question: str, use_cache: bool = True,
+              entity_filters: Optional[List[Tuple[str, str]]] = None,
+              early_exit: bool = EARLY_EXIT_ENABLED) -> Tuple[str, List[Dict], Dict]:
+        with self.perf_tracker.span("query"):
+            model_name = self.llm.model_name
+            corpus_version = self.cache.corpus_version
+            use_cache = use_cache and not entity_filters
+            args = (question, model_name, corpus_version, use_cache, entity_filters, early_exit)
+            
+            if use_cache:
+                flight_key = self._flight_key("query", question, model_name, early_exit)
+                answer, sources = self.flights.do(flight_key, self._answer, *args)
+            else:
+                answer, sources = self._answer(*args)
+            
+            confidence = self.confidence_scorer.calculate_confidence(sources, answer)
+            
+            return answer, sources, confidence
+    
+    def _answer_stream(self, question: str, model_name: str, corpus_version: int, use_cache: bool,
+                       entity_filters: Optional[List[Tuple[str, str]]], early_exit: bool) -> Iterator[Dict]:
+        query_embedding = self._embed_query(question)
         
         if use_cache:
-            self.cache.set(question, (answer, sources))
+            cached_result = self._lookup_cache(question, query_embedding, model_name)
+            if cached_result:
+                answer, sources = cached_result
+                yield {"type": "token", "content": answer}
+                yield {"type": "final", "answer": answer, "sources": sources}
+                return
+        
+        contexts, sources = self._retrieve(question, query_embedding, entity_filters)
+        
+        exited_early = self._should_exit_early(sources, early_exit)
+        if exited_early:
+            answer = NOT_FOUND_ANSWER
+            yield {"type": "token", "content": answer}
+        else:
+            tokens = []
+            with closing(self._stream_answer(question, contexts)) as stream:
+                for token in stream:
+                    tokens.append(token)
+                    yield {"type": "token", "content": token}
+            answer = "".join(tokens)
+        
+        if use_cache and not exited_early:
+            self.cache.set(question, (answer, sources), query_embedding, model_name, corpus_version)
+        
+        yield {"type": "final", "answer": answer, "sources": sources}
+    
+    def query_stream(self, question: str, use_cache: bool = True,
+                     entity_filters: Optional[List[Tuple[str, str]]] = None,
+                     early_exit: bool = EARLY_EXIT_ENABLED) -> Iterator[Dict]:
+        start_time = time.perf_counter()
+        
+        model_name = self.llm.model_name
+        corpus_version = self.cache.corpus_version
+        use_cache = use_cache and not entity_filters
+        args = (question, model_name, corpus_version, use_cache, entity_filters, early_exit)
+        
+        if use_cache:
+            flight_key = self._flight_key("query_stream", question, model_name, early_exit)
+            events = self.flights.stream(flight_key, self._answer_stream, *args)
+        else:
+            events = self._answer_stream(*args)
+        
+        with closing(events):
+            for event in events:
+                if event["type"] == "final":
+                    self.perf_tracker.record("query_times", time.perf_counter() - start_time)
+                    event = {**event, "confidence": self.confidence_scorer.calculate_confidence(event["sources"], event["answer"])}
+                yield event
+    
+    @measure_time("query_batch")
+    def query_batch(self, questions: List[str], use_cache: bool = True,
+                    max_workers: int = LLM_MAX_CONCURRENCY,
+                    early_exit: bool = EARLY_EXIT_ENABLED) -> List[Tuple[str, List[Dict], Dict]]:
+        if not questions:
+            return []
+        
+        model_name = self.llm.model_name
+        corpus_version = self.cache.corpus_version
+        with self.perf_tracker.span("embedding"):
+            query_embeddings = self.embedding_gen.generate_embeddings(questions, show_progress_bar=False)
+        
+        results = [None] * len(questions)
+        pending = []
+        for i, question in enumerate(questions):
+            cached_result = self._lookup_cache(question, query_embeddings[i], model_name) if use_cache else None
+            if cached_result:
+                answer, sources = cached_result
+                results[i] = (answer, sources, self.confidence_scorer.calculate_confidence(sources, answer))
+            else:
+                pending.append(i)
+        
+        if not pending:
+            return results
         
-        query_time = time.time() - start_time
-        self.perf_tracker.track_query_time(query_time)
+        with self.perf_tracker.span("retrieval"):
+            search_results = self.vector_store.search_batch(
+                [query_embeddings[i].tolist() for i in pending],
+                top_k=RETRIEVAL_CANDIDATES,
+                query_texts=[questions[i] for i in pending]
+            )
+        contexts_list = []
+        sources_list = []
+        for row, i in enumerate(pending):
+            contexts, sources = self._select_contexts(questions[i], search_results, row)
+            contexts_list.append(contexts)
+            sources_list.append(sources)
+        answers = [NOT_FOUND_ANSWER if self._should_exit_early(sources, early_exit) else None for sources in sources_list]
+        to_generate = [row for row, answer in enumerate(answers) if answer is None]
+        generated_rows = set(to_generate)
         
-        confidence = self.confidence_scorer.calculate_confidence(sources, answer)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            generated = executor.map(
+                self._generate_answer,
+                [questions[pending[row]] for row in to_generate],
+                [contexts_list[row] for row in to_generate]
+            )
+            for row, answer in zip(to_generate, generated):
+                answers[row] = answer
         
-        return answer, sources, confidence
+        for row, (i, answer) in enumerate(zip(pending, answers)):
+            sources = sources_list[row]
+            if use_cache and row in generated_rows:
+                self.cache.set(questions[i], (answer, sources), query_embeddings[i], model_name, corpus_version)
+            results[i] = (answer, sources, self.confidence_scorer.calculate_confidence(sources, answer))
+        
+        return results
     
+    @measure_time("summarize")
     def summarize_document(self, filename: str) -> str:
-        results = self.vector_store.collection.get(
-            where={"filename": filename}
-        )
+        chunks = self.vector_store.chunk_store.document_texts(filename)
         
-        if not results['documents']:
+        if not chunks:
             return "Document not found"
         
-        full_text = " ".join(results['documents'][:5])
-        summary = self.llm.summarize_document(full_text)
+        return self.summarizer.summarize(chunks)
+    
+    def _comparison_error(self, doc_names: List[str]) -> Optional[str]:
+        catalog = set(self.get_all_documents())
+        if len(doc_names) < 2:
+            return "Select at least two documents to compare"
+        if any(doc_name not in catalog for doc_name in doc_names):
+            return "One or more documents not found"
+        return None
+    
+    def _document_excerpts(self, doc_name: str, aspect_embedding: List[float], top_k: int) -> List[str]:
+        results = self.vector_store.search(aspect_embedding, top_k=top_k, where={"filename": doc_name})
+        kept = []
+        used = 0
+        for metadata, chunk in zip(results['metadatas'][0], results['documents'][0]):
+            cost = len(chunk) + (2 if kept else 0)
+            if kept and used + cost > COMPARE_CONTEXT_CHARS:
+                continue
+            kept.append((metadata['chunk_id'], chunk))
+            used += cost
+        return [chunk for _, chunk in sorted(kept, key=lambda item: item[0])]
+    
+    @measure_time("compare")
+    def compare_documents(self, doc_names: List[str], aspect: str, top_k: int = COMPARE_TOP_K) -> str:
+        doc_names = list(dict.fromkeys(doc_names))
+        error = self._comparison_error(doc_names)
+        if error:
+            return error
+        
+        aspect_embedding = self.embedding_gen.generate_single_embedding(aspect).tolist()
+        documents = {doc_name: self._document_excerpts(doc_name, aspect_embedding, top_k) for doc_name in doc_names}
         
-        return summary
+        return self.doc_comparison.compare_documents(documents, aspect)
     
-    def compare_documents(self, doc1_name: str, doc2_name: str, aspect: str) -> str:
-        doc1_results = self.vector_store.collection.get(where={"filename": doc1_name})
-        doc2_results = self.vector_store.collection.get(where={"filename": doc2_name})
+    @measure_time("contradictions")
+    def find_contradictions(self, doc_names: Optional[List[str]] = None,
+                            max_pairs: int = CONTRADICTION_PAIR_BUDGET) -> List[Dict]:
+        chunk_store = self.vector_store.chunk_store
+        chunk_ids = []
+        for doc_name in doc_names or self.get_all_documents():
+            chunk_ids.extend(chunk_store.document_chunk_ids(doc_name))
+        if len(chunk_ids) < 2:
+            return []
         
-        if not doc1_results['documents'] or not doc2_results['documents']:
-            return "One or both documents not found"
+        embeddings, metadatas = self.vector_store.fetch_embeddings(chunk_ids)
+        chunks = ChunkTextView(chunk_store, chunk_ids)
+        return self.doc_comparison.find_contradictions(chunks, metadatas, embeddings, max_pairs)
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return registry.get("async_executor", _create_async_executor)
+    
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+    
+    async def _aanswer(self, question: str, model_name: str, corpus_version: int, use_cache: bool,
+                       entity_filters: Optional[List[Tuple[str, str]]], early_exit: bool) -> Tuple[str, List[Dict]]:
+        sparse_ranking = None
+        if SEARCH_MODE == "hybrid" and not entity_filters:
+            query_embedding, sparse_ranking = await asyncio.gather(
+                self._run(self._embed_query, question),
+                self._run(self.vector_store.sparse_ranking, question, RETRIEVAL_CANDIDATES)
+            )
+        else:
+            query_embedding = await self._run(self._embed_query, question)
+        
+        if use_cache:
+            cached_result = self._lookup_cache(question, query_embedding, model_name)
+            if cached_result:
+                return cached_result
         
-        comparison = self.doc_comparison.compare_documents(
-            doc1_results['documents'],
-            doc2_results['documents'],
-            doc1_name,
-            doc2_name,
-            aspect
-        )
+        contexts, sources = await self._run(self._retrieve, question, query_embedding, entity_filters, sparse_ranking)
         
-        return comparison
+        exited_early = self._should_exit_early(sources, early_exit)
+        if exited_early:
+            answer = NOT_FOUND_ANSWER
+        else:
+            with self.perf_tracker.span("prompt_build"):
+                prompt = self.llm.build_prompt(question, contexts)
+            with self.perf_tracker.span("generation"):
+                answer = await self.llm.agenerate(prompt)
+        
+        if use_cache and not exited_early:
+            self.cache.set(question, (answer, sources), query_embedding, model_name, corpus_version)
+        
+        return answer, sources
+    
+    async def aquery(self, question: str, use_cache: bool = True,
+                     entity_filters: Optional[List[Tuple[str, str]]] = None,
+                     early_exit: bool = EARLY_EXIT_ENABLED) -> Tuple[str, List[Dict], Dict]:
+        with self.perf_tracker.span("query"):
+            model_name = self.llm.model_name
+            corpus_version = self.cache.corpus_version
+            use_cache = use_cache and not entity_filters
+            args = (question, model_name, corpus_version, use_cache, entity_filters, early_exit)
+            
+            if use_cache:
+                flight_key = self._flight_key("query", question, model_name, early_exit)
+                answer, sources = await self.flights.ado(flight_key, self._aanswer, *args)
+            else:
+                answer, sources = await self._aanswer(*args)
+            
+            confidence = self.confidence_scorer.calculate_confidence(sources, answer)
+            
+            return answer, sources, confidence
+    
+    async def aingest(self, file_paths: List[str], extract_entities: bool = INGEST_EXTRACT_ENTITIES) -> Dict:
+        return await self._run(self.ingest_documents, file_paths, extract_entities)
+    
+    async def asummarize(self, filename: str) -> str:
+        with self.perf_tracker.span("summarize"):
+            chunks = self.vector_store.chunk_store.document_texts(filename)
+            
+            if not chunks:
+                return "Document not found"
+            
+            return await self.summarizer.asummarize(chunks)
+    
+    async def acompare(self, doc_names: List[str], aspect: str, top_k: int = COMPARE_TOP_K) -> str:
+        with self.perf_tracker.span("compare"):
+            doc_names = list(dict.fromkeys(doc_names))
+            error = self._comparison_error(doc_names)
+            if error:
+                return error
+            
+            aspect_embedding = (await self._run(self.embedding_gen.generate_single_embedding, aspect)).tolist()
+            excerpts = await asyncio.gather(*[
+                self._run(self._document_excerpts, doc_name, aspect_embedding, top_k) for doc_name in doc_names
+            ])
+            
+            return await self.doc_comparison.acompare_documents(dict(zip(doc_names, excerpts)), aspect)
     
     def get_stats(self) -> Dict:
-        count = self.vector_store.get_collection_count()
+        ready = self.is_ready()
+        count = self.vector_store.get_collection_count() if ready else 0
+        reranker = self.reranker if registry.has("reranker") else None
         perf_metrics = self.perf_tracker.get_metrics()
         cache_stats = self.cache.get_stats()
         
         return {
+            "models_ready": ready,
             "total_chunks": count,
-            "embedding_dimension": self.embedding_gen.get_embedding_dimension(),
+            "embedding_dimension": self.embedding_gen.get_embedding_dimension() if ready else None,
+            "embedding_cache": self.embedding_gen.get_cache_stats() if ready else {},
+            "reranker": reranker.get_stats() if reranker is not None else {},
             "performance": perf_metrics,
-            "cache": cache_stats
+            "cache": cache_stats,
+            "coalescing": self.flights.get_stats()
         }
     
+    def has_document_entities(self, filename: str) -> bool:
+        expected_chunks = self.vector_store.chunk_store.document_chunks.get(filename, 0)
+        return self.vector_store.entity_index.has_document(filename, expected_chunks)
+    
+    def get_unindexed_documents(self) -> List[str]:
+        return [filename for filename in self.get_all_documents() if not self.has_document_entities(filename)]
+    
+    def index_document_entities(self, filename: str) -> bool:
+        if self.has_document_entities(filename):
+            return False
+        
+        chunk_store = self.vector_store.chunk_store
+        entity_index = self.vector_store.entity_index
+        chunk_ids = entity_index.missing_chunks(chunk_store.document_chunk_ids(filename))
+        if not chunk_ids:
+            return False
+        
+        chunks = ChunkTextView(chunk_store, chunk_ids)
+        entity_lists = self.ner.extract_entities_batch(list(chunks))
+        with self.writing():
+            entity_index.add(chunks.chunk_ids, [filename] * len(chunks), entity_lists)
+            entity_index.save()
+        return True
+    
+    def get_entity_summary(self, filename: str, index_missing: bool = True) -> Dict:
+        if index_missing:
+            self.index_document_entities(filename)
+        return self.vector_store.entity_index.document_summary(filename)
+    
+    def get_corpus_entities(self, top_n: int = 10, index_missing: bool = True) -> Dict:
+        if index_missing:
+            for filename in self.get_all_documents():
+                self.index_document_entities(filename)
+        return self.vector_store.entity_index.corpus_summary(top_n)
+    
+    def get_document_catalog(self) -> List[Dict]:
+        return self.vector_store.list_documents()
+    
     def get_all_documents(self) -> List[str]:
-        results = self.vector_store.collection.get()
-        if results and 'metadatas' in results:
-            docs = set([meta['filename'] for meta in results['metadatas']])
-            return list(docs)
-        return []
+        return [entry['filename'] for entry in self.get_document_catalog()]
+    
+    def reload_indexes(self):
+        generation = self.index_generation.read()
+        self.vector_store.reload()
+        self.vector_store.generation = generation
+        self.cache.clear()
+        self.cache.bump_corpus_version()
     
     def clear_database(self):
-        self.vector_store.clear_collection()
+        with self.writing():
+            self.vector_store.clear_collection()
         self.cache.clear()
+        self.cache.bump_corpus_version()
         self.perf_tracker.reset()
@@ -1,24 +1,42 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
-from reportlab.lib import colors
 from datetime import datetime
 import json
 from typing import List, Dict
 
 class ReportGenerator:
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.title_style = ParagraphStyle(
+        self._styles = None
+        self._title_style = None
+    
+    def _load_styles(self):
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib import colors
+        
+        self._styles = getSampleStyleSheet()
+        self._title_style = ParagraphStyle(
             'CustomTitle',
-            parent=self.styles['Heading1'],
+            parent=self._styles['Heading1'],
             fontSize=24,
             textColor=colors.HexColor('#1f77b4'),
             spaceAfter=30,
         )
     
+    @property
+    def styles(self):
+        if self._styles is None:
+            self._load_styles()
+        return self._styles
+    
+    @property
+    def title_style(self):
+        if self._title_style is None:
+            self._load_styles()
+        return self._title_style
+    
     def generate_qa_report(self, chat_history: List[Dict], output_path: str):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        
         doc = SimpleDocTemplate(output_path, pagesize=letter)
         story = []
         
@@ -63,6 +81,11 @@ class ReportGenerator:
         return output_path
     
     def generate_analytics_report(self, analytics: Dict, entities: Dict, output_path: str):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+        from reportlab.lib import colors
+        
         doc = SimpleDocTemplate(output_path, pagesize=letter)
         story = []
         
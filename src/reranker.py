@@ -0,0 +1,69 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+import numpy as np
+from config.config import RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_CACHE_SIZE
+
+class Reranker:
+    def __init__(self, model_name: str = RERANK_MODEL, cache_size: int = RERANK_CACHE_SIZE):
+        import torch
+        from sentence_transformers import CrossEncoder
+        
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, default_activation_function=torch.nn.Sigmoid())
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _query_key(self, query: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{query}".encode('utf-8')).hexdigest()
+    
+    def score(self, query: str, chunk_ids: List[str], texts: List[str]) -> np.ndarray:
+        query_key = self._query_key(query)
+        scores = np.zeros(len(chunk_ids), dtype=np.float32)
+        missing = []
+        with self.lock:
+            for i, chunk_id in enumerate(chunk_ids):
+                cached = self.cache.get((query_key, chunk_id))
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self.cache.move_to_end((query_key, chunk_id))
+                    scores[i] = cached
+            self.hits += len(chunk_ids) - len(missing)
+            self.misses += len(missing)
+        
+        if missing:
+            predicted = self.model.predict(
+                [(query, texts[i]) for i in missing],
+                batch_size=RERANK_BATCH_SIZE,
+                show_progress_bar=False
+            )
+            scores[missing] = predicted
+            with self.lock:
+                for i, value in zip(missing, predicted):
+                    self.cache[(query_key, chunk_ids[i])] = float(value)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        
+        return scores
+    
+    def rerank(self, query: str, chunk_ids: List[str], texts: List[str], top_k: int) -> List[Tuple[int, float]]:
+        if not chunk_ids:
+            return []
+        scores = self.score(query, chunk_ids, texts)
+        order = np.argsort(-scores, kind='stable')[:top_k]
+        return [(int(i), float(scores[i])) for i in order]
+    
+    def get_stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
@@ -0,0 +1,128 @@
+import fcntl
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+from config.config import INDEX_GENERATION_PATH, INGEST_LOCK_PATH
+
+logger = logging.getLogger(__name__)
+
+class ResourceRegistry:
+    def __init__(self):
+        self._resources: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._status: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        if name in self._resources:
+            return self._resources[name]
+        
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        
+        with lock:
+            if name not in self._resources:
+                self._status[name] = "loading"
+                try:
+                    self._resources[name] = factory()
+                except Exception as e:
+                    self._status[name] = f"failed: {e}"
+                    raise
+                self._status[name] = "ready"
+            return self._resources[name]
+    
+    def warm_up(self, factories: Dict[str, Callable[[], Any]]):
+        with self._lock:
+            pending = {name: factory for name, factory in factories.items() if self.is_retryable(name)}
+            for name in pending:
+                self._status[name] = "queued"
+        
+        if pending:
+            threading.Thread(target=self._load_all, args=(pending,), daemon=True).start()
+    
+    def _load_all(self, factories: Dict[str, Callable[[], Any]]):
+        for name, factory in factories.items():
+            try:
+                self.get(name, factory)
+            except Exception as e:
+                logger.error(f"Failed to load {name}: {e}")
+    
+    def status(self) -> Dict[str, str]:
+        return dict(self._status)
+    
+    def is_failed(self, name: str) -> bool:
+        return self._status.get(name, "").startswith("failed")
+    
+    def is_retryable(self, name: str) -> bool:
+        return name not in self._status or self.is_failed(name)
+    
+    def is_ready(self, names: List[str]) -> bool:
+        return all(self._status.get(name) == "ready" for name in names)
+    
+    def has(self, name: str) -> bool:
+        return name in self._resources
+    
+    def names(self) -> List[str]:
+        return list(self._resources)
+    
+    def clear(self):
+        with self._lock:
+            self._resources.clear()
+            self._locks.clear()
+            self._status.clear()
+
+registry = ResourceRegistry()
+
+class IndexGeneration:
+    _holders: Dict[str, threading.RLock] = {}
+    _depths: Dict[str, int] = {}
+    _holder_lock = threading.Lock()
+    
+    def __init__(self, path: str = INDEX_GENERATION_PATH, lock_path: str = INGEST_LOCK_PATH):
+        self.path = path
+        self.lock_path = lock_path
+    
+    def read(self) -> int:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+    
+    def bump(self) -> int:
+        generation = self.read() + 1
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(generation))
+        os.replace(tmp_path, self.path)
+        return generation
+    
+    @contextmanager
+    def _locked(self, mode: int):
+        with open(self.lock_path, 'a+') as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    @contextmanager
+    def exclusive(self):
+        with self._holder_lock:
+            lock = self._holders.setdefault(self.lock_path, threading.RLock())
+        with lock:
+            depth = self._depths.get(self.lock_path, 0)
+            self._depths[self.lock_path] = depth + 1
+            try:
+                if depth:
+                    yield
+                else:
+                    with self._locked(fcntl.LOCK_EX):
+                        yield
+            finally:
+                self._depths[self.lock_path] = depth
+    
+    def shared(self):
+        return self._locked(fcntl.LOCK_SH)
@@ -0,0 +1,422 @@
+import hmac
+import ipaddress
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Generator, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from src.rag_pipeline import RAGPipeline
+from src.entity_index import parse_entity_filters
+from config.config import (INGEST_EXTRACT_ENTITIES, COMPARE_TOP_K,
+                           CONTRADICTION_PAIR_BUDGET, EARLY_EXIT_ENABLED, SERVICE_HOST,
+                           SERVICE_PORT, SERVICE_WORKERS, SERVICE_MAX_BODY_BYTES, SERVICE_INGEST_ROOT, SERVICE_TOKEN)
+
+logger = logging.getLogger(__name__)
+
+class RequestGate:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._closed = False
+    
+    @contextmanager
+    def request(self):
+        with self._condition:
+            while self._closed:
+                self._condition.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+    
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            while self._closed:
+                self._condition.wait()
+            self._closed = True
+            while self._active:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._closed = False
+                self._condition.notify_all()
+
+class PipelineService:
+    def __init__(self, model_name: str = "llama3.2:3b"):
+        self.pipeline = RAGPipeline(model_name)
+        self.generation = self.pipeline.index_generation
+        self.loaded_generation = self.generation.read()
+        self.gate = RequestGate()
+        self.reload_lock = threading.Lock()
+    
+    def warm_up(self):
+        RAGPipeline.warm_up()
+    
+    def _reload(self, generation: int):
+        with self.gate.exclusive():
+            self.pipeline.reload_indexes()
+        self.loaded_generation = generation
+    
+    def sync(self):
+        if self.generation.read() == self.loaded_generation:
+            return
+        with self.reload_lock, self.generation.shared():
+            current = self.generation.read()
+            if current != self.loaded_generation:
+                self._reload(current)
+    
+    @contextmanager
+    def reading(self):
+        self.sync()
+        with self.gate.request():
+            yield self.pipeline
+    
+    @contextmanager
+    def writing(self):
+        with self.generation.exclusive():
+            current = self.generation.read()
+            if current != self.loaded_generation:
+                self._reload(current)
+            try:
+                with self.gate.request():
+                    yield self.pipeline
+            finally:
+                self.loaded_generation = self.generation.read()
+    
+    def ingest(self, file_paths: List[str], extract_entities: bool = INGEST_EXTRACT_ENTITIES) -> Dict:
+        with self.writing() as pipeline:
+            return pipeline.ingest_documents(file_paths, extract_entities=extract_entities)
+    
+    def query(self, question: str, use_cache: bool = True,
+              entity_filters: Optional[List[Tuple[str, str]]] = None,
+              early_exit: bool = EARLY_EXIT_ENABLED) -> Dict:
+        with self.reading() as pipeline:
+            answer, sources, confidence = pipeline.query(question, use_cache, entity_filters, early_exit)
+        return {"answer": answer, "sources": sources, "confidence": confidence}
+    
+    def query_stream(self, question: str, use_cache: bool = True,
+                     entity_filters: Optional[List[Tuple[str, str]]] = None,
+                     early_exit: bool = EARLY_EXIT_ENABLED) -> Generator[Dict, None, None]:
+        with self.reading() as pipeline:
+            yield from pipeline.query_stream(question, use_cache, entity_filters, early_exit)
+    
+    def query_batch(self, questions: List[str], use_cache: bool = True,
+                    early_exit: bool = EARLY_EXIT_ENABLED) -> List[Dict]:
+        with self.reading() as pipeline:
+            results = pipeline.query_batch(questions, use_cache=use_cache, early_exit=early_exit)
+        return [
+            {"question": question, "answer": answer, "sources": sources, "confidence": confidence}
+            for question, (answer, sources, confidence) in zip(questions, results)
+        ]
+    
+    def summarize(self, filename: str) -> Dict:
+        with self.reading() as pipeline:
+            return {"filename": filename, "summary": pipeline.summarize_document(filename)}
+    
+    def compare(self, doc_names: List[str], aspect: str, top_k: int = COMPARE_TOP_K) -> Dict:
+        with self.reading() as pipeline:
+            return {"documents": doc_names, "aspect": aspect,
+                    "comparison": pipeline.compare_documents(doc_names, aspect, top_k)}
+    
+    def contradictions(self, doc_names: Optional[List[str]] = None,
+                       max_pairs: int = CONTRADICTION_PAIR_BUDGET) -> Dict:
+        with self.reading() as pipeline:
+            return {"contradictions": pipeline.find_contradictions(doc_names, max_pairs)}
+    
+    def entities(self, filename: Optional[str] = None, top_n: int = 10) -> Dict:
+        with self.reading() as pipeline:
+            filenames = [filename] if filename else pipeline.get_all_documents()
+            unindexed = [name for name in filenames if not pipeline.has_document_entities(name)]
+            if filename:
+                result = {"filename": filename, "entities": pipeline.get_entity_summary(filename, index_missing=False)}
+            else:
+                result = {"entities": pipeline.get_corpus_entities(top_n, index_missing=False)}
+        result["unindexed"] = unindexed
+        return result
+    
+    def index_entities(self, filenames: Optional[List[str]] = None) -> Dict:
+        with self.writing() as pipeline:
+            filenames = filenames or pipeline.get_all_documents()
+            indexed = [name for name in filenames if pipeline.index_document_entities(name)]
+        return {"indexed": indexed}
+    
+    def documents(self) -> List[Dict]:
+        with self.reading() as pipeline:
+            return pipeline.get_document_catalog()
+    
+    def stats(self) -> Dict:
+        with self.reading() as pipeline:
+            stats = pipeline.get_stats()
+        stats["service"] = {"pid": os.getpid(), "generation": self.loaded_generation}
+        return stats
+    
+    def health(self) -> Dict:
+        return {"status": "ok", "ready": RAGPipeline.is_ready(), "pid": os.getpid(),
+                "generation": self.loaded_generation}
+
+def _json_default(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+def to_json(payload) -> bytes:
+    return json.dumps(payload, default=_json_default).encode('utf-8')
+
+def request_entity_filters(value) -> Optional[List[Tuple[str, str]]]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        return parse_entity_filters(value) or None
+    return [(str(label).strip().upper(), str(text).strip()) for label, text in value]
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+    
+    @property
+    def service(self) -> PipelineService:
+        return self.server.service
+    
+    def _send_json(self, payload, status: int = 200):
+        body = to_json(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self._has_unread_body():
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_stream(self, events: Generator[Dict, None, None]):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for event in events:
+                line = to_json(event) + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b"\r\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return
+        except Exception as e:
+            logger.exception("Streaming request failed")
+            line = to_json({"type": "error", "error": str(e)}) + b"\n"
+            self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b"\r\n")
+        finally:
+            events.close()
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def _has_unread_body(self) -> bool:
+        return not self.body_read and self.headers.get("Content-Length", "0").strip() not in ("", "0")
+    
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length", 0))
+        if length > SERVICE_MAX_BODY_BYTES:
+            raise ValueError(f"Request body exceeds {SERVICE_MAX_BODY_BYTES} bytes")
+        data = self.rfile.read(length)
+        self.body_read = True
+        body = json.loads(data or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+    
+    def _authorized(self, path: str) -> bool:
+        token = self.server.token
+        if not token or path == "/health":
+            return True
+        header = self.headers.get("Authorization", "")
+        return header.startswith("Bearer ") and hmac.compare_digest(header[7:].encode(), token.encode())
+    
+    def _dispatch(self, routes: Dict, *args):
+        self.body_read = False
+        path = urlparse(self.path).path.rstrip("/") or "/"
+        route = routes.get(path)
+        if route is None:
+            self._send_json({"error": f"Unknown endpoint {path}"}, 404)
+            return
+        if not self._authorized(path):
+            self._send_json({"error": "Missing or invalid bearer token"}, 401)
+            return
+        try:
+            result = route(*args)
+        except PermissionError as e:
+            self._send_json({"error": str(e)}, 403)
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json({"error": str(e)}, 400)
+            return
+        except Exception as e:
+            logger.exception("Request to %s failed", path)
+            self._send_json({"error": str(e)}, 500)
+            return
+        if result is not None:
+            self._send_json(result)
+    
+    def do_GET(self):
+        query = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+        self._dispatch({
+            "/health": lambda: self.service.health(),
+            "/stats": lambda: self.service.stats(),
+            "/documents": lambda: {"documents": self.service.documents()},
+            "/entities": lambda: self.service.entities(query.get("filename"), int(query.get("top_n", 10))),
+        })
+    
+    def do_POST(self):
+        self._dispatch({
+            "/ingest": self._ingest,
+            "/query": self._query,
+            "/query/batch": self._query_batch,
+            "/summarize": self._summarize,
+            "/compare": self._compare,
+            "/contradictions": self._contradictions,
+            "/entities": self._entities,
+            "/entities/index": self._index_entities,
+        })
+    
+    def _ingest(self) -> Dict:
+        body = self._read_json()
+        root = os.path.realpath(self.server.ingest_root)
+        paths = [os.path.realpath(os.path.join(root, path)) for path in body["paths"]]
+        outside = [path for path in paths if os.path.commonpath([root, path]) != root]
+        if outside:
+            raise PermissionError(f"Paths must be inside the ingest root {root}: {', '.join(outside)}")
+        missing = [path for path in paths if not os.path.isfile(path)]
+        if missing:
+            raise ValueError(f"Files not found on the server: {', '.join(missing)}")
+        return self.service.ingest(paths, bool(body.get("extract_entities", INGEST_EXTRACT_ENTITIES)))
+    
+    def _query(self) -> Optional[Dict]:
+        body = self._read_json()
+        question = body["question"]
+        args = (
+            question,
+            bool(body.get("use_cache", True)),
+            request_entity_filters(body.get("entity_filters")),
+            bool(body.get("early_exit", EARLY_EXIT_ENABLED))
+        )
+        if body.get("stream"):
+            self._send_stream(self.service.query_stream(*args))
+            return None
+        return self.service.query(*args)
+    
+    def _query_batch(self) -> Dict:
+        body = self._read_json()
+        results = self.service.query_batch(
+            list(body["questions"]),
+            bool(body.get("use_cache", True)),
+            bool(body.get("early_exit", EARLY_EXIT_ENABLED))
+        )
+        return {"results": results}
+    
+    def _summarize(self) -> Dict:
+        return self.service.summarize(self._read_json()["filename"])
+    
+    def _compare(self) -> Dict:
+        body = self._read_json()
+        return self.service.compare(list(body["documents"]), body["aspect"], int(body.get("top_k", COMPARE_TOP_K)))
+    
+    def _contradictions(self) -> Dict:
+        body = self._read_json()
+        return self.service.contradictions(body.get("documents"), int(body.get("max_pairs", CONTRADICTION_PAIR_BUDGET)))
+    
+    def _entities(self) -> Dict:
+        body = self._read_json()
+        return self.service.entities(body.get("filename"), int(body.get("top_n", 10)))
+    
+    def _index_entities(self) -> Dict:
+        return self.service.index_entities(self._read_json().get("documents"))
+
+class PipelineHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address: Tuple[str, int], service: PipelineService, reuse_port: bool = False,
+                 ingest_root: str = SERVICE_INGEST_ROOT, token: Optional[str] = SERVICE_TOKEN):
+        self.service = service
+        self.reuse_port = reuse_port
+        self.ingest_root = ingest_root
+        self.token = token
+        super().__init__(address, ServiceHandler)
+    
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def serve_worker(host: str = SERVICE_HOST, port: int = SERVICE_PORT, model_name: str = "llama3.2:3b",
+                 reuse_port: bool = False, offline_models: bool = False,
+                 ingest_root: str = SERVICE_INGEST_ROOT, token: Optional[str] = SERVICE_TOKEN):
+    if offline_models:
+        from benchmarks.offline_models import install_offline_models
+        install_offline_models()
+    
+    service = PipelineService(model_name)
+    service.warm_up()
+    server = PipelineHTTPServer((host, port), service, reuse_port, ingest_root, token)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    logger.info("Worker %s serving on http://%s:%s", os.getpid(), host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, workers: int = SERVICE_WORKERS,
+          model_name: str = "llama3.2:3b", offline_models: bool = False,
+          ingest_root: str = SERVICE_INGEST_ROOT, token: Optional[str] = SERVICE_TOKEN):
+    if not token and not is_loopback(host):
+        raise ValueError(f"Refusing to serve on non-loopback host {host} without a token (set DOC_INTEL_TOKEN)")
+    os.makedirs(ingest_root, exist_ok=True)
+    
+    if workers <= 1:
+        serve_worker(host, port, model_name, False, offline_models, ingest_root, token)
+        return
+    
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve_worker, args=(host, port, model_name, True, offline_models, ingest_root, token),
+                        daemon=False)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    
+    def stop(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop()
+        for process in processes:
+            process.join()
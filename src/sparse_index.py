@@ -0,0 +1,195 @@
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import List, Optional, Tuple
+import numpy as np
+from config.config import BM25_INDEX_DIR, BM25_K1, BM25_B
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_./:]")
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(TOKEN_SEPARATORS.split(token))
+    return tokens
+
+class BM25Index:
+    def __init__(self, index_dir: str = BM25_INDEX_DIR, k1: float = BM25_K1, b: float = BM25_B):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        self._reset()
+    
+    def _reset(self):
+        self.vocab = {}
+        self.postings_docs = []
+        self.postings_tfs = []
+        self.doc_ids = []
+        self.doc_index = {}
+        self.doc_lengths = array('i')
+        self.live = bytearray()
+        self.total_length = 0
+    
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_index)
+    
+    def add(self, ids: List[str], texts: List[str]):
+        with self.lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self.doc_index:
+                    continue
+                
+                position = len(self.doc_ids)
+                term_counts = Counter(tokenize(text))
+                for term, tf in term_counts.items():
+                    term_id = self.vocab.get(term)
+                    if term_id is None:
+                        term_id = len(self.postings_docs)
+                        self.vocab[term] = term_id
+                        self.postings_docs.append(array('i'))
+                        self.postings_tfs.append(array('i'))
+                    self.postings_docs[term_id].append(position)
+                    self.postings_tfs[term_id].append(tf)
+                
+                length = sum(term_counts.values())
+                self.doc_ids.append(doc_id)
+                self.doc_index[doc_id] = position
+                self.doc_lengths.append(length)
+                self.live.append(1)
+                self.total_length += length
+    
+    def remove(self, ids: List[str]):
+        with self.lock:
+            for doc_id in ids:
+                position = self.doc_index.pop(doc_id, None)
+                if position is not None:
+                    self.live[position] = 0
+                    self.total_length -= self.doc_lengths[position]
+    
+    def clear(self):
+        with self.lock:
+            self._reset()
+    
+    def search(self, query: str, top_k: int, allowed_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        with self.lock:
+            if not self.doc_index:
+                return []
+            
+            live = np.frombuffer(self.live, dtype=np.uint8).astype(bool)
+            if allowed_ids is not None:
+                allowed = np.zeros(len(live), dtype=bool)
+                allowed[[self.doc_index[doc_id] for doc_id in allowed_ids if doc_id in self.doc_index]] = True
+                live &= allowed
+            lengths = np.frombuffer(self.doc_lengths, dtype=np.int32)
+            num_docs = len(self.doc_index)
+            avg_length = self.total_length / num_docs if num_docs else 1.0
+            scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+            
+            for term in set(tokenize(query)):
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    continue
+                docs = np.frombuffer(self.postings_docs[term_id], dtype=np.int32)
+                tfs = np.frombuffer(self.postings_tfs[term_id], dtype=np.int32)
+                mask = live[docs]
+                docs = docs[mask]
+                if not len(docs):
+                    continue
+                tfs = tfs[mask].astype(np.float32)
+                
+                idf = math.log(1.0 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / avg_length)
+                scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+            
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > top_k:
+                candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+            ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return [(self.doc_ids[i], float(scores[i])) for i in ranked]
+    
+    def _compact(self):
+        live_positions = [position for position in range(len(self.doc_ids)) if self.live[position]]
+        remap = np.full(len(self.doc_ids), -1, dtype=np.int32)
+        remap[live_positions] = np.arange(len(live_positions), dtype=np.int32)
+        
+        vocab = {}
+        postings_docs = []
+        postings_tfs = []
+        for term, term_id in self.vocab.items():
+            docs = remap[np.frombuffer(self.postings_docs[term_id], dtype=np.int32)]
+            mask = docs >= 0
+            if not mask.any():
+                continue
+            vocab[term] = len(postings_docs)
+            postings_docs.append(array('i', docs[mask].tobytes()))
+            postings_tfs.append(array('i', np.frombuffer(self.postings_tfs[term_id], dtype=np.int32)[mask].tobytes()))
+        
+        self.vocab = vocab
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self.doc_ids = [self.doc_ids[position] for position in live_positions]
+        self.doc_index = {doc_id: position for position, doc_id in enumerate(self.doc_ids)}
+        self.doc_lengths = array('i', (self.doc_lengths[position] for position in live_positions))
+        self.live = bytearray(b'\x01' * len(self.doc_ids))
+    
+    def save(self):
+        with self.lock:
+            if len(self.doc_ids) > 2 * len(self.doc_index):
+                self._compact()
+            
+            os.makedirs(self.index_dir, exist_ok=True)
+            terms = sorted(self.vocab, key=self.vocab.get)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(docs) for docs in self.postings_docs], dtype=np.int64)
+            
+            arrays_path = os.path.join(self.index_dir, "postings.npz")
+            np.savez(
+                f"{arrays_path}.tmp.npz",
+                offsets=offsets,
+                docs=np.frombuffer(b''.join(a.tobytes() for a in self.postings_docs), dtype=np.int32),
+                tfs=np.frombuffer(b''.join(a.tobytes() for a in self.postings_tfs), dtype=np.int32),
+                lengths=np.frombuffer(self.doc_lengths.tobytes(), dtype=np.int32),
+                live=np.frombuffer(bytes(self.live), dtype=np.uint8)
+            )
+            
+            meta_path = os.path.join(self.index_dir, "meta.json")
+            with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump({"terms": terms, "doc_ids": self.doc_ids}, f)
+            
+            os.replace(f"{arrays_path}.tmp.npz", arrays_path)
+            os.replace(f"{meta_path}.tmp", meta_path)
+    
+    def load(self) -> bool:
+        arrays_path = os.path.join(self.index_dir, "postings.npz")
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        with self.lock:
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                data = np.load(arrays_path)
+                offsets, docs, tfs = data['offsets'], data['docs'], data['tfs']
+                lengths, live = data['lengths'], data['live']
+            except (FileNotFoundError, KeyError, ValueError, OSError):
+                self._reset()
+                return False
+            
+            self._reset()
+            self.vocab = {term: term_id for term_id, term in enumerate(meta['terms'])}
+            for start, end in zip(offsets[:-1], offsets[1:]):
+                self.postings_docs.append(array('i', docs[start:end].tobytes()))
+                self.postings_tfs.append(array('i', tfs[start:end].tobytes()))
+            self.doc_ids = meta['doc_ids']
+            self.doc_lengths = array('i', lengths.astype(np.int32).tobytes())
+            self.live = bytearray(live.astype(np.uint8).tobytes())
+            self.doc_index = {doc_id: position for position, doc_id in enumerate(self.doc_ids) if self.live[position]}
+            self.total_length = int(lengths[live.astype(bool)].sum())
+            return True
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+from config.config import SUMMARY_CACHE_DIR, SUMMARY_BATCH_CHARS, SUMMARY_FANOUT, LLM_MAX_CONCURRENCY
+
+MAP_PROMPT = """Summarize the following section of a document. Keep every key fact, figure and name.
+
+Section:
+{text}
+
+Summary:"""
+
+REDUCE_PROMPT = """Combine the following partial summaries of one document into a single summary. Remove repetition but keep every key fact.
+
+Partial summaries:
+{text}
+
+Combined summary:"""
+
+FINAL_PROMPT = """Summarize the following document in a concise manner. Focus on the key points and main ideas.
+
+Document:
+{text}
+
+Summary:"""
+
+class SummaryCache:
+    def __init__(self, cache_dir: str = SUMMARY_CACHE_DIR):
+        self.cache_dir = cache_dir
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+    
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)['summary']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+    
+    def set(self, key: str, summary: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"summary": summary}, f)
+        os.replace(tmp_path, path)
+
+class MapReduceSummarizer:
+    def __init__(self, llm_handler, cache: Optional[SummaryCache] = None, batch_chars: int = SUMMARY_BATCH_CHARS,
+                 fanout: int = SUMMARY_FANOUT, max_workers: int = LLM_MAX_CONCURRENCY):
+        self.llm = llm_handler
+        self.cache = cache if cache is not None else SummaryCache()
+        self.batch_chars = batch_chars
+        self.fanout = fanout
+        self.max_workers = max_workers
+    
+    @staticmethod
+    def _hash(*parts: str) -> str:
+        return hashlib.sha1("\0".join(parts).encode('utf-8')).hexdigest()
+    
+    def _split(self, items: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        pieces = []
+        for key, text in items:
+            if len(text) <= self.batch_chars:
+                pieces.append((key, text))
+                continue
+            start = 0
+            while start < len(text):
+                end = start + self.batch_chars
+                if end < len(text):
+                    space = text.rfind(" ", start + self.batch_chars // 2, end)
+                    if space > start:
+                        end = space
+                pieces.append((self._hash(key, str(start)), text[start:end]))
+                start = end
+        return pieces
+    
+    def _group(self, items: List[Tuple[str, str]], force_pairs: bool = False) -> List[List[Tuple[str, str]]]:
+        groups = []
+        group = []
+        group_chars = 0
+        for key, text in items:
+            over_budget = group_chars + len(text) > self.batch_chars
+            boundary = int(group[-1][0][:8], 16) % self.fanout == 0 if group else False
+            if group and (len(group) >= 2 or not force_pairs) and (over_budget or (len(group) >= 2 and boundary)):
+                groups.append(group)
+                group = []
+                group_chars = 0
+            group.append((key, text))
+            group_chars += len(text)
+        if group:
+            groups.append(group)
+        return groups
+    
+    def _next_level(self, items: List[Tuple[str, str]], summaries: List[Tuple[str, str]],
+                    force_pairs: bool) -> Tuple[List[Tuple[str, str]], bool]:
+        if force_pairs or len(summaries) >= len(items):
+            return summaries, True
+        return self._split(summaries), False
+    
+    def _group_key(self, model_name: str, template: str, group: List[Tuple[str, str]]) -> str:
+        return self._hash(model_name, template, *[child_key for child_key, _ in group])
+    
+    def _group_prompt(self, template: str, group: List[Tuple[str, str]]) -> str:
+        return template.format(text="\n\n".join(text for _, text in group))
+    
+    def _summarize_group(self, model_name: str, template: str, group: List[Tuple[str, str]]) -> Tuple[str, str]:
+        key = self._group_key(model_name, template, group)
+        summary = self.cache.get(key)
+        if summary is None:
+            summary = self.llm.generate(self._group_prompt(template, group))
+            self.cache.set(key, summary)
+        return key, summary
+    
+    async def _asummarize_group(self, model_name: str, template: str, group: List[Tuple[str, str]]) -> Tuple[str, str]:
+        key = self._group_key(model_name, template, group)
+        summary = self.cache.get(key)
+        if summary is None:
+            summary = await self.llm.agenerate(self._group_prompt(template, group))
+            self.cache.set(key, summary)
+        return key, summary
+    
+    def summarize(self, chunks: Sequence[str]) -> str:
+        model_name = self.llm.model_name
+        items = [(self._hash(chunk), chunk) for chunk in chunks]
+        if not items:
+            return ""
+        
+        items = self._split(items)
+        force_pairs = False
+        template = MAP_PROMPT
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                groups = self._group(items, force_pairs)
+                if len(groups) == 1:
+                    return self._summarize_group(model_name, FINAL_PROMPT, groups[0])[1]
+                summaries = list(executor.map(lambda group: self._summarize_group(model_name, template, group), groups))
+                items, force_pairs = self._next_level(items, summaries, force_pairs)
+                template = REDUCE_PROMPT
+    
+    async def asummarize(self, chunks: Sequence[str]) -> str:
+        model_name = self.llm.model_name
+        items = [(self._hash(chunk), chunk) for chunk in chunks]
+        if not items:
+            return ""
+        
+        items = self._split(items)
+        force_pairs = False
+        template = MAP_PROMPT
+        while True:
+            groups = self._group(items, force_pairs)
+            if len(groups) == 1:
+                return (await self._asummarize_group(model_name, FINAL_PROMPT, groups[0]))[1]
+            summaries = await asyncio.gather(*[self._asummarize_group(model_name, template, group) for group in groups])
+            items, force_pairs = self._next_level(items, list(summaries), force_pairs)
+            template = REDUCE_PROMPT
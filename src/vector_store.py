@@ -1,15 +1,131 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict
-from config.config import CHROMA_DIR, RETRIEVAL_TOP_K
+from typing import List, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+from config.config import CHROMA_DIR, RETRIEVAL_TOP_K, MANIFEST_PATH, SEARCH_MODE, HYBRID_CANDIDATES, RRF_K
+from src.sparse_index import BM25Index
+from src.entity_index import EntityIndex
+from src.chunk_store import ChunkStore
+
+def make_chunk_ids(filename: str, chunks: List[str], seen: Optional[Dict[str, int]] = None) -> List[str]:
+    ids = []
+    seen = {} if seen is None else seen
+    for chunk in chunks:
+        digest = hashlib.sha1(f"{filename}\0{chunk}".encode()).hexdigest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class DocumentManifest:
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self.documents = self._load()
+    
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def get(self, filename: str) -> Optional[Dict]:
+        return self.documents.get(filename)
+    
+    def set(self, filename: str, file_hash: Optional[str], chunk_ids: List[str], mtime: Optional[float],
+            size_bytes: Optional[int] = None):
+        self.documents[filename] = {
+            "file_hash": file_hash,
+            "chunk_ids": chunk_ids,
+            "mtime": mtime,
+            "num_chunks": len(chunk_ids),
+            "size_bytes": size_bytes,
+            "ingested_at": time.time()
+        }
+    
+    def add_chunks(self, filename: str, chunk_ids: List[str], chunk_sizes: List[int]):
+        entry = self.documents.get(filename)
+        if entry is None:
+            entry = {"file_hash": None, "chunk_ids": [], "mtime": None, "size_bytes": 0}
+            self.documents[filename] = entry
+        known = set(entry['chunk_ids'])
+        for chunk_id, size in zip(chunk_ids, chunk_sizes):
+            if chunk_id not in known:
+                known.add(chunk_id)
+                entry['chunk_ids'].append(chunk_id)
+                entry['size_bytes'] = (entry.get('size_bytes') or 0) + size
+        entry['num_chunks'] = len(entry['chunk_ids'])
+        entry['ingested_at'] = time.time()
+    
+    def catalog(self) -> List[Dict]:
+        documents = dict(self.documents)
+        return [
+            {
+                "filename": filename,
+                "num_chunks": entry.get('num_chunks', len(entry['chunk_ids'])),
+                "size_bytes": entry.get('size_bytes'),
+                "ingested_at": entry.get('ingested_at', entry.get('mtime')),
+                "file_hash": entry.get('file_hash')
+            }
+            for filename, entry in sorted(documents.items())
+        ]
+    
+    def remove(self, filename: str):
+        self.documents.pop(filename, None)
+    
+    def clear(self):
+        self.documents = {}
+        self.save()
+    
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.documents, f)
+        os.replace(tmp_path, self.path)
 
 class VectorStore:
     def __init__(self):
-        self.client = chromadb.PersistentClient(
+        self.client = self._open_client()
+        self.collection = None
+        self.manifest = DocumentManifest()
+        self.sparse_index = BM25Index()
+        self.entity_index = EntityIndex()
+        self.chunk_store = ChunkStore()
+        self.write_lock = threading.RLock()
+        self.generation = 0
+    
+    @staticmethod
+    def _open_client():
+        import chromadb
+        from chromadb.config import Settings
+        
+        return chromadb.PersistentClient(
             path=CHROMA_DIR,
             settings=Settings(anonymized_telemetry=False)
         )
-        self.collection = None
+    
+    def reload(self):
+        from chromadb.api.client import SharedSystemClient
+        
+        with self.write_lock:
+            collection_name = self.collection.name if self.collection else "documents"
+            SharedSystemClient.clear_system_cache()
+            self.client = self._open_client()
+            self.manifest = DocumentManifest()
+            self.sparse_index = BM25Index()
+            self.entity_index = EntityIndex()
+            self.chunk_store = ChunkStore()
+            self.get_or_create_collection(collection_name)
     
     def create_collection(self, collection_name: str = "documents"):
         try:
@@ -28,25 +144,211 @@ class VectorStore:
             self.collection = self.client.get_collection(name=collection_name)
         except:
             self.collection = self.create_collection(collection_name)
+        
+        self.entity_index.load()
+        self.sparse_index.load()
+        self.chunk_store.load()
+        count = self.collection.count()
+        if self.sparse_index.num_docs != count:
+            self.rebuild_sparse_index()
+        if self.chunk_store.num_chunks != count:
+            self.rebuild_chunk_store()
+        self._backfill_catalog()
         return self.collection
     
-    def add_documents(self, chunks: List[str], metadatas: List[Dict], embeddings: List):
-        ids = [f"doc_{i}" for i in range(len(chunks))]
+    def _backfill_catalog(self):
+        missing = [filename for filename in self.chunk_store.list_documents() if self.manifest.get(filename) is None]
+        for filename in missing:
+            chunk_ids = self.chunk_store.document_chunk_ids(filename)
+            self.manifest.set(filename, None, chunk_ids, None, self.chunk_store.document_bytes(filename))
+        if missing:
+            self.manifest.save()
+    
+    def _iter_collection(self, include: List[str], page_size: int = 1000):
+        offset = 0
+        while True:
+            page = self.collection.get(include=include, limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            yield page
+            offset += len(page['ids'])
+    
+    def rebuild_sparse_index(self, page_size: int = 1000):
+        self.sparse_index.clear()
+        for page in self._iter_collection(["documents"], page_size):
+            self.sparse_index.add(page['ids'], page['documents'])
+        self.sparse_index.save()
+    
+    def rebuild_chunk_store(self, page_size: int = 1000):
+        self.chunk_store.clear()
+        for page in self._iter_collection(["documents", "metadatas"], page_size):
+            self.chunk_store.add(page['ids'], page['documents'], page['metadatas'])
+        self.chunk_store.save()
+    
+    def add_documents(self, chunks: List[str], metadatas: List[Dict], embeddings: List, ids: Optional[List[str]] = None):
+        if ids is None:
+            ids = [None] * len(chunks)
+            positions = {}
+            for i, meta in enumerate(metadatas):
+                positions.setdefault(meta['filename'], []).append(i)
+            for filename, indices in positions.items():
+                for i, chunk_id in zip(indices, make_chunk_ids(filename, [chunks[i] for i in indices])):
+                    ids[i] = chunk_id
+        
+        self.upsert_documents(ids, chunks, metadatas, embeddings)
         
-        self.collection.add(
+        added = {}
+        for chunk_id, chunk, meta in zip(ids, chunks, metadatas):
+            added.setdefault(meta['filename'], []).append((chunk_id, len(chunk.encode('utf-8'))))
+        for filename, entries in added.items():
+            self.manifest.add_chunks(filename, [chunk_id for chunk_id, _ in entries], [size for _, size in entries])
+        self.manifest.save()
+    
+    def upsert_documents(self, ids: List[str], chunks: List[str], metadatas: List[Dict], embeddings: List):
+        self.collection.upsert(
             documents=chunks,
             metadatas=metadatas,
             embeddings=embeddings,
             ids=ids
         )
+        self.sparse_index.add(ids, chunks)
+        self.chunk_store.add(ids, chunks, metadatas)
+    
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        self.collection.update(ids=ids, metadatas=metadatas)
+        self.chunk_store.update_metadatas(ids, metadatas)
+    
+    def delete_ids(self, ids: List[str]):
+        if ids:
+            self.collection.delete(ids=ids)
+            self.sparse_index.remove(ids)
+            self.entity_index.remove(ids)
+            self.chunk_store.remove(ids)
     
-    def search(self, query_embedding: List[float], top_k: int = RETRIEVAL_TOP_K) -> Dict:
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
+    def persist(self):
+        self.sparse_index.save()
+        self.entity_index.save()
+        self.chunk_store.save()
+    
+    def search(self, query_embedding: List[float], top_k: int = RETRIEVAL_TOP_K,
+               query_text: Optional[str] = None, mode: str = SEARCH_MODE,
+               entity_filters: Optional[List[Tuple[str, str]]] = None, where: Optional[Dict] = None,
+               sparse_ranking: Optional[List[str]] = None) -> Dict:
+        return self.search_batch([query_embedding], top_k, [query_text], mode, entity_filters, where,
+                                 None if sparse_ranking is None else [sparse_ranking])
+    
+    def sparse_ranking(self, query_text: str, top_k: int = RETRIEVAL_TOP_K) -> List[str]:
+        return [doc_id for doc_id, _ in self.sparse_index.search(query_text, max(top_k, HYBRID_CANDIDATES))]
+    
+    def search_batch(self, query_embeddings: List[List[float]], top_k: int = RETRIEVAL_TOP_K,
+                     query_texts: Optional[List[Optional[str]]] = None, mode: str = SEARCH_MODE,
+                     entity_filters: Optional[List[Tuple[str, str]]] = None, where: Optional[Dict] = None,
+                     sparse_rankings: Optional[List[List[str]]] = None) -> Dict:
+        if entity_filters:
+            candidate_ids = self.entity_index.get_chunk_ids(entity_filters)
+            return self._search_candidates(query_embeddings, candidate_ids, top_k, query_texts, mode)
+        
+        if where or mode != "hybrid" or not query_texts or not any(query_texts):
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=top_k,
+                where=where
+            )
+            return results
+        
+        num_candidates = max(top_k, HYBRID_CANDIDATES)
+        dense = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=num_candidates,
+            include=[]
         )
+        
+        row_ids = []
+        for row, query_text in enumerate(query_texts):
+            sparse_ids = []
+            if sparse_rankings is not None:
+                sparse_ids = sparse_rankings[row]
+            elif query_text:
+                sparse_ids = self.sparse_ranking(query_text, top_k)
+            row_ids.append(reciprocal_rank_fusion([dense['ids'][row], sparse_ids])[:top_k])
+        
+        return self._assemble_results(query_embeddings, row_ids)
+    
+    def _search_candidates(self, query_embeddings: List[List[float]], candidate_ids: List[str], top_k: int,
+                           query_texts: Optional[List[Optional[str]]], mode: str, page_size: int = 5000) -> Dict:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        num_candidates = max(top_k, HYBRID_CANDIDATES)
+        
+        kept_ids = np.array([], dtype=object)
+        kept_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(candidate_ids), page_size):
+            page = self.collection.get(ids=candidate_ids[start:start + page_size], include=["embeddings"])
+            if not page['ids']:
+                continue
+            matrix = np.asarray(page['embeddings'], dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            kept_ids = np.concatenate([kept_ids, np.array(page['ids'], dtype=object)])
+            kept_scores = np.concatenate([kept_scores, queries @ matrix.T], axis=1)
+            if kept_scores.shape[1] > num_candidates:
+                top = np.argpartition(-kept_scores, num_candidates - 1, axis=1)[:, :num_candidates]
+                columns = np.unique(top)
+                kept_ids = kept_ids[columns]
+                kept_scores = kept_scores[:, columns]
+        
+        row_ids = []
+        for row in range(len(queries)):
+            order = np.argsort(-kept_scores[row], kind='stable')[:num_candidates]
+            dense_ids = kept_ids[order].tolist()
+            sparse_ids = []
+            if mode == "hybrid" and query_texts and query_texts[row]:
+                sparse_ids = [doc_id for doc_id, _ in self.sparse_index.search(query_texts[row], num_candidates, candidate_ids)]
+            row_ids.append(reciprocal_rank_fusion([dense_ids, sparse_ids])[:top_k])
+        
+        return self._assemble_results(query_embeddings, row_ids)
+    
+    def _assemble_results(self, query_embeddings: List[List[float]], row_ids: List[List[str]]) -> Dict:
+        unique_ids = list({doc_id for ids in row_ids for doc_id in ids})
+        records = {}
+        if unique_ids:
+            fetched = self.collection.get(ids=unique_ids, include=["documents", "metadatas", "embeddings"])
+            for doc_id, document, metadata, embedding in zip(fetched['ids'], fetched['documents'], fetched['metadatas'], fetched['embeddings']):
+                records[doc_id] = (document, metadata, np.asarray(embedding, dtype=np.float32))
+        
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query_embedding, ids in zip(query_embeddings, row_ids):
+            ids = [doc_id for doc_id in ids if doc_id in records]
+            distances = []
+            if ids:
+                query_vector = np.asarray(query_embedding, dtype=np.float32)
+                matrix = np.stack([records[doc_id][2] for doc_id in ids])
+                norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+                distances = (1.0 - (matrix @ query_vector) / np.where(norms == 0, 1.0, norms)).tolist()
+            
+            results["ids"].append(ids)
+            results["documents"].append([records[doc_id][0] for doc_id in ids])
+            results["metadatas"].append([records[doc_id][1] for doc_id in ids])
+            results["distances"].append(distances)
         return results
     
+    def fetch_embeddings(self, ids: List[str], page_size: int = 5000) -> Tuple[np.ndarray, List[Dict]]:
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        embeddings = None
+        metadatas = [None] * len(ids)
+        for start in range(0, len(ids), page_size):
+            page = self.collection.get(ids=ids[start:start + page_size], include=["embeddings", "metadatas"])
+            for doc_id, embedding, metadata in zip(page['ids'], page['embeddings'], page['metadatas']):
+                if embeddings is None:
+                    embeddings = np.zeros((len(ids), len(embedding)), dtype=np.float32)
+                embeddings[positions[doc_id]] = embedding
+                metadatas[positions[doc_id]] = metadata
+        if embeddings is None:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        return embeddings, metadatas
+    
+    def list_documents(self) -> List[Dict]:
+        return self.manifest.catalog()
+    
     def get_collection_count(self) -> int:
         if self.collection:
             return self.collection.count()
@@ -57,3 +359,8 @@ class VectorStore:
             collection_name = self.collection.name
             self.client.delete_collection(name=collection_name)
             self.collection = self.create_collection(collection_name)
+        self.manifest.clear()
+        self.sparse_index.clear()
+        self.entity_index.clear()
+        self.chunk_store.clear()
+        self.persist()